@@ -25,6 +25,7 @@ class Application(tk.Tk):
         banner_inverted_filepath = os.path.join(os.getcwd(), config.get('application.assets', 'banner_inverted'))
         self.color_palette = enums.ColorPaletteEnum(config)
         self.icons = enums.IconsEnum(config)
+        self.settings = enums.SettingsEnum(config)
         self.lpack = enums.LanguagePackEnum(config.get('application', 'language_pack'))
 
         self.title(title)
@@ -85,6 +86,7 @@ class Application(tk.Tk):
                 [ObjectDetection],
                 self.color_palette,
                 self.lpack,
+                self.settings,
                 self.header_title,
                 self.header_subtitle
             ),
@@ -95,6 +97,7 @@ class Application(tk.Tk):
                 [MinMaxSlopes],
                 self.color_palette,
                 self.lpack,
+                self.settings,
                 self.header_title,
                 self.header_subtitle
             )
@@ -189,11 +192,12 @@ class Application(tk.Tk):
 
 class SidebarSubMenu(tk.Frame):
 
-    def __init__(self, parent: tk.Frame, main_frame: tk.Frame, heading: str, option_classes: list, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, header_title, header_subtitle) -> None:
+    def __init__(self, parent: tk.Frame, main_frame: tk.Frame, heading: str, option_classes: list, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, settings: enums.SettingsEnum, header_title, header_subtitle) -> None:
         tk.Frame.__init__(self, parent)
 
         self.color_palette = color_palette
         self.lpack = langage_pack
+        self.settings = settings
         self.header_title = header_title
         self.header_subtitle = header_subtitle
 
@@ -215,7 +219,7 @@ class SidebarSubMenu(tk.Frame):
 
         self.options = []
         for option_class in option_classes:
-            option = option_class(main_frame, self.color_palette, self.lpack, self.header_title, self.header_subtitle)
+            option = option_class(main_frame, self.color_palette, self.lpack, self.settings, self.header_title, self.header_subtitle)
             option.place(relx=0, rely=0, relwidth=1, relheight=1)
             self.options.append(option)
 
@@ -0,0 +1,119 @@
+import os
+import cv2
+import glob
+import hashlib
+import numpy as np
+
+from . import video
+
+
+
+class FrameCache:
+    '''On-disk cache of decoded frames, stored as memory-mapped .npy files.
+
+    Entries are keyed by a hash of the video file (its first and last megabytes, its size and
+    its modification time), of the resolution the frames were decoded at and of the window of decoded frames. Cached frames are
+    memory-mapped instead of being read, so re-opening a video is almost instant and its frames
+    are backed by the page cache instead of private memory. When the cache grows above its size
+    limit, the least recently used entries are removed.
+    '''
+
+    sample_size = 1 << 20 # Number of bytes hashed at the beginning and at the end of the video file
+
+    def __init__(self, directory: str, size_limit: int) -> None:
+        '''
+        :param str directory: The directory where the cached frames are stored.
+        :param int size_limit: The maximum size of the cache, in bytes.
+        '''
+        self.directory = directory
+        self.size_limit = size_limit
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, video_path: str, width: int, start: int = 0, stop: int = None) -> str:
+        '''Return the key identifying the frames of a video decoded at a given resolution.
+
+        :param str video_path: Path to the video file.
+        :param int width: The width the frames were resized to, None for the full resolution.
+        :param int start: Index of the first decoded frame, defaults to 0
+        :param int stop: Index after the last decoded frame, defaults to None (end of the video)
+        :return str: The key.
+        '''
+        stat = os.stat(video_path)
+        h = hashlib.blake2b(digest_size=16)
+        with open(video_path, 'rb') as f:
+            h.update(f.read(self.sample_size))
+            f.seek(max(0, stat.st_size - self.sample_size))
+            h.update(f.read(self.sample_size))
+        h.update(f'{stat.st_size}:{stat.st_mtime_ns}:{width}'.encode())
+        if start != 0 or stop is not None:
+            h.update(f':{start}:{stop}'.encode()) # Keys of whole videos are kept as they were
+        return h.hexdigest()
+
+    def load(self, video_path: str, width: int = None, start: int = 0, stop: int = None) -> video.FrameStore:
+        '''Return the cached frames of a video, or None if they are not in the cache.
+
+        :param str video_path: Path to the video file.
+        :param int width: The width the frames were resized to, defaults to None (full resolution)
+        :param int start: Index of the first decoded frame, defaults to 0
+        :param int stop: Index after the last decoded frame, defaults to None (end of the video)
+        :return video.FrameStore: The cached frames, memory-mapped, or None.
+        '''
+        frames_path = self._path(self.key(video_path, width, start, stop))
+        if not os.path.exists(frames_path):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(frames_path)
+        frames = np.load(frames_path, mmap_mode='r')
+
+        capture = cv2.VideoCapture(video_path)
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        full_size = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        capture.release()
+        return video.FrameStore(video_path, frames, fps, full_size, first_frame=start)
+
+    def save(self, store: video.FrameStore, width: int = None, stop: int = None) -> video.FrameStore:
+        '''Write the frames of a store to the cache.
+        The given store is released, and a store memory-mapping the cached frames is returned instead.
+
+        :param video.FrameStore store: The frames to cache.
+        :param int width: The width the frames were resized to, defaults to None (full resolution)
+        :param int stop: Index after the last frame the store was asked to decode, defaults to None (end of the video)
+        :return video.FrameStore: The cached frames, memory-mapped.
+        '''
+        frames_path = self._path(self.key(store.video_path, width, store.first_frame, stop))
+        self._evict(store.frames.nbytes)
+
+        # The file is written under a temporary name first, so that an interrupted write can't leave a partial entry
+        mmap = np.lib.format.open_memmap(frames_path + '.tmp', mode='w+', dtype=np.uint8, shape=store.frames.shape)
+        mmap[:] = store.frames
+        mmap.flush()
+        del mmap
+        os.replace(frames_path + '.tmp', frames_path)
+
+        video_path, fps, full_size, first_frame = store.video_path, store.fps, (store.full_width, store.full_height), store.first_frame
+        store.release()
+        frames = np.load(frames_path, mmap_mode='r')
+        return video.FrameStore(video_path, frames, fps, full_size, first_frame=first_frame)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def _evict(self, needed_size: int) -> None:
+        '''Remove the least recently used entries until there is enough room for a new one.
+
+        :param int needed_size: The size of the new entry, in bytes.
+        '''
+        entries = []
+        for frames_path in glob.glob(os.path.join(self.directory, '*.npy')):
+            entries.append((os.path.getmtime(frames_path), os.path.getsize(frames_path), frames_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, frames_path in sorted(entries):
+            if total_size + needed_size <= self.size_limit:
+                break
+            try:
+                os.remove(frames_path)
+                total_size -= size
+            except OSError:
+                pass # The entry is still mapped by another store (on Windows)
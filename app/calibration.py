@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+
+
+class Calibration:
+    '''Transform from the pixel coordinates of the video to real coordinates.
+
+    The transform is a 3x3 matrix acting on homogeneous coordinates, so that any combination of scaling,
+    translation, rotation and axis flips is a single matrix, and a whole trajectory is converted in one operation.
+    The matrix may be a homography, computed from four points of the plane of motion, when the camera is not square to it.
+    Missing positions are NaN, and stay NaN through the transform.
+    '''
+
+    def __init__(self, matrix: np.ndarray) -> None:
+        '''
+        :param np.ndarray matrix: The 3x3 matrix transforming homogeneous pixel coordinates into real coordinates.
+        '''
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+
+    @classmethod
+    def from_scale(cls, scale_point_1: tuple[int, int], scale_point_2: tuple[int, int], scale_distance: float, origin_point: tuple[float, float], rotation: float = 0, flip_x: bool = False, flip_y: bool = False) -> 'Calibration':
+        '''Build the transform given by a known distance between two points and an origin.
+
+        :param tuple[int, int] scale_point_1: The first point defining the scale, in pixels.
+        :param tuple[int, int] scale_point_2: The second point defining the scale, in pixels.
+        :param float scale_distance: The real distance between the two points defining the scale.
+        :param tuple[float, float] origin_point: The pixel coordinates of the origin.
+        :param float rotation: The angle of the real x axis from the image's x axis, in degrees, counterclockwise as seen on the image, defaults to 0
+        :param bool flip_x: Whether the real x axis points to the left of the image, defaults to False
+        :param bool flip_y: Whether the real y axis points to the top of the image, defaults to False
+        :return Calibration: The transform.
+        '''
+        x1, y1, x2, y2 = *scale_point_1, *scale_point_2
+        cfactor = scale_distance / ( (x1 - x2)**2 + (y1 - y2)**2 ) **.5
+        return cls(cls._orient(np.eye(3), origin_point, rotation, flip_x, flip_y, cfactor))
+
+    @classmethod
+    def from_plane(cls, corners: list[tuple[int, int]], width: float, height: float, origin_point: tuple[float, float], rotation: float = 0, flip_x: bool = False, flip_y: bool = False) -> 'Calibration':
+        '''Build the transform given by the corners of a rectangle of known size lying in the plane of motion.
+        The homography mapping the corners to the rectangle corrects the perspective of a camera that is not square to the plane.
+
+        :param list[tuple[int, int]] corners: The four corners of the rectangle, in pixels, in order around it, starting from the one at its top left.
+        :param float width: The real length of the side between the first two corners.
+        :param float height: The real length of the side between the second and third corners.
+        :param tuple[float, float] origin_point: The pixel coordinates of the origin.
+        :param float rotation: The angle of the real x axis from the rectangle's first side, in degrees, counterclockwise as seen on the image, defaults to 0
+        :param bool flip_x: Whether the real x axis points from the second corner to the first one, defaults to False
+        :param bool flip_y: Whether the real y axis points from the third corner to the second one, defaults to False
+        :return Calibration: The transform.
+        '''
+        if len(corners) != 4:
+            raise ValueError(f'A plane is defined by 4 corners, got {len(corners)}')
+        rectangle = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+        homography = cv2.getPerspectiveTransform(np.array(corners, dtype=np.float32), rectangle).astype(np.float64)
+
+        # The origin is a pixel, it is placed on the plane before the axes are oriented around it
+        origin = cls(homography).apply(*np.array(origin_point, dtype=np.float64).reshape(2, 1))
+        return cls(cls._orient(homography, (origin[0][0], origin[1][0]), rotation, flip_x, flip_y))
+
+    @staticmethod
+    def _orient(matrix: np.ndarray, origin: tuple[float, float], rotation: float, flip_x: bool, flip_y: bool, factor: float = 1) -> np.ndarray:
+        '''Move the origin of the coordinates given by a matrix, then rotate, flip and scale their axes.
+
+        :param np.ndarray matrix: The 3x3 matrix giving the coordinates to orient.
+        :param tuple[float, float] origin: The origin, in the coordinates given by the matrix.
+        :param float rotation: The angle of the new x axis, in degrees, counterclockwise as seen on the image.
+        :param bool flip_x: Whether the new x axis is flipped.
+        :param bool flip_y: Whether the new y axis is flipped.
+        :param float factor: The scale factor of the new coordinates, defaults to 1
+        :return np.ndarray: The 3x3 matrix giving the new coordinates.
+        '''
+        ox, oy = origin
+
+        # Image rows go downward, so a counterclockwise angle on the image is a negative angle in its coordinates
+        theta = -np.radians(rotation)
+        cos, sin = np.cos(theta), np.sin(theta)
+        translation = np.array([[1, 0, -ox], [0, 1, -oy], [0, 0, 1]], dtype=np.float64)
+        rotation_matrix = np.array([[cos, sin, 0], [-sin, cos, 0], [0, 0, 1]], dtype=np.float64) # Projects on the rotated axes
+        scaling = np.diag([-factor if flip_x else factor, -factor if flip_y else factor, 1])
+        return scaling @ rotation_matrix @ translation @ matrix
+
+    def local_scale(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        '''The factor applied to lengths around each point, used to convert radii.
+        It is the same everywhere for an affine transform, but a homography enlarges the parts of the plane far from the camera.
+
+        :param np.ndarray x: The x coordinates, in pixels, NaN where missing.
+        :param np.ndarray y: The y coordinates, in pixels, NaN where missing.
+        :return np.ndarray: The factor around each point, NaN where missing.
+        '''
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        m = self.matrix
+        w = m[2, 0] * x + m[2, 1] * y + m[2, 2]
+        # Square root of the determinant of the transform's jacobian, det(m) / w**3
+        return np.sqrt(np.abs(np.linalg.det(m) / w**3))
+
+    def apply(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''Transform pixel coordinates into real coordinates, in a single call to cv2.perspectiveTransform.
+
+        :param np.ndarray x: The x coordinates, in pixels, NaN where missing.
+        :param np.ndarray y: The y coordinates, in pixels, NaN where missing.
+        :return tuple[np.ndarray, np.ndarray]: The real x and y coordinates, NaN where missing.
+        '''
+        points = np.empty((np.size(x), 1, 2), dtype=np.float64)
+        points[:, 0, 0], points[:, 0, 1] = np.ravel(x), np.ravel(y)
+        if len(points) == 0:
+            return points[:, 0, 0], points[:, 0, 1]
+        real = cv2.perspectiveTransform(points, self.matrix)
+        # OpenCV maps NaN to 0, the missing positions are restored
+        real[np.isnan(points).any(axis=2)] = np.nan
+        return real[:, 0, 0], real[:, 0, 1]
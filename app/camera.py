@@ -0,0 +1,179 @@
+import os
+import cv2
+import json
+import numpy as np
+from typing import Callable
+
+from . import video
+
+
+
+class CameraProfile:
+    '''Intrinsics and lens distortion of a camera, as found by a checkerboard calibration.
+
+    Undistorting every frame would cost a remap of the whole image per frame, so the correction is applied
+    to the detected positions only, all at once with cv2.undistortPoints. Frames are only undistorted when
+    they are displayed, through maps computed once for each frame size and kept by the profile.
+    Corrected positions are pixels of the undistorted frames, so points clicked on them need no further correction.
+    '''
+
+    def __init__(self, camera_matrix: np.ndarray, distortion: np.ndarray, image_size: tuple[int, int]) -> None:
+        '''
+        :param np.ndarray camera_matrix: The 3x3 intrinsic matrix of the camera.
+        :param np.ndarray distortion: The distortion coefficients of the lens, in OpenCV's order (k1, k2, p1, p2, k3...).
+        :param tuple[int, int] image_size: The size of the frames the camera was calibrated on, in format (width, height).
+        '''
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.distortion = np.asarray(distortion, dtype=np.float64).ravel()
+        self.image_size = tuple(int(n) for n in image_size)
+        self._maps: dict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_checkerboard_video(cls, video_path: str, pattern_size: tuple[int, int], max_views: int = 40, detection_width: int = 640, on_progress: Callable[[int, int], None] = None) -> 'CameraProfile':
+        '''Calibrate a camera from a video of a checkerboard moved around its field of view.
+        The checkerboard is searched on frames evenly spread over the video, reduced to detection_width,
+        and the corners found are refined on the frames at full resolution.
+
+        :param str video_path: Path to the video file.
+        :param tuple[int, int] pattern_size: The number of inner corners of the checkerboard, per row and per column.
+        :param int max_views: The number of frames searched for the checkerboard, defaults to 40
+        :param int detection_width: The width of the frames the checkerboard is searched on, defaults to 640
+        :param Callable[[int, int], None] on_progress: Called with the number of frames searched and the number to search, defaults to None
+        :raises ValueError: If the checkerboard is found on too few frames.
+        :return CameraProfile: The profile of the camera.
+        '''
+        source = video.VideoFrameSource(video_path)
+        step = max(1, len(source) // max_views)
+        image_size = source.width, source.height
+        scale = min(1, detection_width / source.width)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 1e-3)
+
+        # Corners of the checkerboard in its own plane, the size of its squares doesn't change the intrinsics
+        board = np.zeros((pattern_size[0] * pattern_size[1], 3), dtype=np.float32)
+        board[:, :2] = np.mgrid[:pattern_size[0], :pattern_size[1]].T.reshape(-1, 2)
+
+        object_points, image_points = [], []
+        views = min(max_views, -(-len(source) // step))
+        try:
+            for i, frame in enumerate(source.iter_frames(step=step)):
+                if i >= views:
+                    break
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+                found, corners = cv2.findChessboardCorners(small, pattern_size, flags=cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK)
+                if found:
+                    corners = cv2.cornerSubPix(gray, corners / scale, (11, 11), (-1, -1), criteria)
+                    object_points.append(board)
+                    image_points.append(corners)
+                if on_progress is not None:
+                    on_progress(i + 1, views)
+        finally:
+            source.release()
+
+        if len(image_points) < 5:
+            raise ValueError(f'The checkerboard was only found on {len(image_points)} frames, at least 5 are needed')
+        _, camera_matrix, distortion, _, _ = cv2.calibrateCamera(object_points, image_points, image_size, None, None)
+        return cls(camera_matrix, distortion, image_size)
+
+    @classmethod
+    def load(cls, path: str) -> 'CameraProfile':
+        '''Read a profile written by save.
+
+        :param str path: Path to the profile file.
+        :return CameraProfile: The profile.
+        '''
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['camera_matrix'], data['distortion'], data['image_size'])
+
+    def save(self, path: str) -> None:
+        '''Write the profile to a JSON file.
+
+        :param str path: Path to the profile file.
+        '''
+        data = {
+            'camera_matrix': self.camera_matrix.tolist(),
+            'distortion': self.distortion.tolist(),
+            'image_size': list(self.image_size),
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+        os.replace(path + '.tmp', path)
+
+    def _camera_matrix(self, size: tuple[int, int]) -> np.ndarray:
+        '''The intrinsic matrix for frames of another size than the calibration's, assuming the camera scaled its image.'''
+        if tuple(size) == self.image_size:
+            return self.camera_matrix
+        sx, sy = size[0] / self.image_size[0], size[1] / self.image_size[1]
+        return np.diag([sx, sy, 1]) @ self.camera_matrix
+
+    def undistort_points(self, x: np.ndarray, y: np.ndarray, size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        '''Correct the distortion of pixel coordinates, in a single call to cv2.undistortPoints.
+
+        :param np.ndarray x: The x coordinates, in pixels, NaN where missing.
+        :param np.ndarray y: The y coordinates, in pixels, NaN where missing.
+        :param tuple[int, int] size: The size of the frames the coordinates are taken on, in format (width, height).
+        :return tuple[np.ndarray, np.ndarray]: The x and y coordinates on the undistorted frames, NaN where missing.
+        '''
+        points = np.empty((np.size(x), 1, 2), dtype=np.float64)
+        points[:, 0, 0], points[:, 0, 1] = np.ravel(x), np.ravel(y)
+        missing = np.isnan(points).any(axis=2)
+        points[missing] = np.nan
+        if missing.all():
+            return points[:, 0, 0], points[:, 0, 1]
+        camera_matrix = self._camera_matrix(size)
+        # The undistorted coordinates are projected back with the same intrinsics, to stay in pixels
+        undistorted = cv2.undistortPoints(np.nan_to_num(points), camera_matrix, self.distortion, P=camera_matrix)
+        undistorted[missing] = np.nan
+        return undistorted[:, 0, 0], undistorted[:, 0, 1]
+
+    def undistort_image(self, image: cv2.typing.MatLike) -> cv2.typing.MatLike:
+        '''Return an undistorted copy of a frame, for display.
+        The remapping maps are computed by cv2.initUndistortRectifyMap on the first frame of each size, and reused afterwards.
+
+        :param cv2.typing.MatLike image: The frame.
+        :return cv2.typing.MatLike: The undistorted frame.
+        '''
+        size = image.shape[1], image.shape[0]
+        if size not in self._maps:
+            camera_matrix = self._camera_matrix(size)
+            self._maps[size] = cv2.initUndistortRectifyMap(camera_matrix, self.distortion, None, camera_matrix, size, cv2.CV_16SC2)
+        map1, map2 = self._maps[size]
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+
+
+class CameraProfileStore:
+    '''Profiles of the cameras calibrated so far, stored as JSON files named after the cameras,
+    so that a camera is only calibrated once and its profile is reused across sessions.
+    '''
+
+    def __init__(self, directory: str) -> None:
+        '''
+        :param str directory: The directory where the profiles are stored.
+        '''
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, camera_name: str) -> str:
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in camera_name)
+        return os.path.join(self.directory, f'{safe_name}.json')
+
+    def load(self, camera_name: str) -> CameraProfile:
+        '''Return the profile of a camera, or None if it was never calibrated.
+
+        :param str camera_name: The name of the camera.
+        :return CameraProfile: The profile, or None.
+        '''
+        path = self._path(camera_name)
+        if not os.path.exists(path):
+            return None
+        return CameraProfile.load(path)
+
+    def save(self, camera_name: str, profile: CameraProfile) -> None:
+        '''Store the profile of a camera, replacing its previous one.
+
+        :param str camera_name: The name of the camera.
+        :param CameraProfile profile: The profile.
+        '''
+        profile.save(self._path(camera_name))
@@ -0,0 +1,1038 @@
+import os
+import cv2
+import queue
+import imutils
+import threading
+import numpy as np
+import concurrent.futures
+from typing import Callable, Iterator
+from multiprocessing import shared_memory
+
+from . import video
+
+
+
+class _Buffers:
+    '''Images reused by the detection of consecutive frames, so that each frame is processed without allocating new ones.
+    A block of frames is laid out contiguously, so that it can also be processed as a single image stacked vertically.
+    '''
+
+    __slots__ = ('key', 'resized', 'blurred', 'hsv', 'mask', 'filtered')
+
+    def __init__(self, count: int, height: int, width: int, resized: bool = True) -> None:
+        '''
+        :param int count: The number of frames of a block.
+        :param int height: The height of the images.
+        :param int width: The width of the images.
+        :param bool resized: Whether an image receiving the resized frames is needed, defaults to True
+        '''
+        self.key = (count, height, width)
+        self.resized = np.empty((count, height, width, 3), dtype=np.uint8) if resized else None
+        self.blurred = np.empty((count, height, width, 3), dtype=np.uint8)
+        self.hsv = np.empty((count, height, width, 3), dtype=np.uint8)
+        self.mask = np.empty((count, height, width), dtype=np.uint8)
+        self.filtered = np.empty((height, width), dtype=np.uint8)
+
+    def window(self, height: int, width: int) -> '_Buffers':
+        '''Return buffers for a single image of at most as many pixels, as contiguous views on the memory of these ones.'''
+        window = _Buffers.__new__(_Buffers)
+        window.key = (1, height, width)
+        window.resized = None
+        window.blurred = self.blurred.reshape(-1)[:height * width * 3].reshape(1, height, width, 3)
+        window.hsv = self.hsv.reshape(-1)[:height * width * 3].reshape(1, height, width, 3)
+        window.mask = self.mask.reshape(-1)[:height * width].reshape(1, height, width)
+        window.filtered = self.filtered.reshape(-1)[:height * width].reshape(height, width)
+        return window
+
+
+_local = threading.local()
+
+
+def _get_buffers(count: int, height: int, width: int) -> _Buffers:
+    '''Return the buffers of the calling thread for blocks of frames of a given size, allocated on their first use.
+    The buffers of each size are kept, so that switching between sizes, e.g. from a coarse level to the processing width, doesn't allocate them again.
+    '''
+    buffers = getattr(_local, 'buffers', None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    key = (count, height, width)
+    if key not in buffers:
+        buffers[key] = _Buffers(count, height, width)
+    return buffers[key]
+
+
+def _get_window_buffers(height: int, width: int) -> _Buffers:
+    '''Return the buffers of the calling thread for a window of a frame, whose size changes from one frame to the next.
+    They are views on buffers sized after the largest window so far, which are only allocated again when a window is larger.
+    '''
+    buffers = getattr(_local, 'window_buffers', None)
+    if buffers is None or buffers.key[1] * buffers.key[2] < height * width:
+        buffers = _local.window_buffers = _Buffers(1, height, width, resized=False)
+    return buffers.window(height, width)
+
+
+def _find_object(image: cv2.typing.MatLike, lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, detector: str = 'contours', buffers: _Buffers = None, blur_size: int = 11, iterations: int = 2) -> tuple[tuple[float], tuple[float]]:
+    '''Find the largest object within the given HSV color range on an image, without resizing it.
+
+    :param cv2.typing.MatLike image: The image to process, in BGR format.
+    :param tuple[int] lower_bound: Lower HSV bound of the color range.
+    :param tuple[int] upper_bound: Upper HSV bound of the color range.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param str detector: The name of the detector finding the object on the color mask, see DETECTORS, defaults to 'contours'
+    :param _Buffers buffers: The buffers to work in, of the image's size, defaults to None (new buffers)
+    :param int blur_size: The size of the Gaussian blur kernel, odd, defaults to 11
+    :param int iterations: The number of erosions and dilations removing the small blobs of the mask, defaults to 2
+    :return tuple[tuple[float], tuple[float]]: A tuple containing two elements, in the image's coordinates,
+        - The detected circle, in format (x, y, radius) or None
+        - The detected centroid, in format (x, y) or None
+    '''
+    return _find_objects(image, [(lower_bound, upper_bound)], object_radius_threshold, detector, buffers, blur_size, iterations)[0]
+
+
+def _find_objects(image: cv2.typing.MatLike, color_bounds: list[tuple[tuple[int], tuple[int]]], object_radius_threshold: int = 2, detector: str = 'contours', buffers: _Buffers = None, blur_size: int = 11, iterations: int = 2) -> list[tuple[tuple[float], tuple[float]]]:
+    '''Find the largest object within each of the given HSV color ranges on an image, without resizing it.
+    The image is blurred and converted to HSV once, only the color masks are computed for each object.
+
+    :param cv2.typing.MatLike image: The image to process, in BGR format.
+    :param list[tuple[tuple[int], tuple[int]]] color_bounds: The lower and upper HSV bounds of the color range of each object.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param str detector: The name of the detector finding the objects on the color masks, see DETECTORS, defaults to 'contours'
+    :param _Buffers buffers: The buffers to work in, of the image's size, defaults to None (new buffers)
+    :param int blur_size: The size of the Gaussian blur kernel, odd, defaults to 11
+    :param int iterations: The number of erosions and dilations removing the small blobs of the masks, defaults to 2
+    :return list[tuple[tuple[float], tuple[float]]]: The detected circle and centroid of each object, in the image's coordinates.
+    '''
+    if buffers is None:
+        buffers = _Buffers(1, *image.shape[:2], resized=False)
+    # Blur and convert the image to HSV
+    cv2.GaussianBlur(image, (blur_size, blur_size), 0, dst=buffers.blurred[0])
+    cv2.cvtColor(buffers.blurred[0], cv2.COLOR_BGR2HSV, dst=buffers.hsv[0])
+    # Apply a color mask for each object
+    results = []
+    for lower_bound, upper_bound in color_bounds:
+        cv2.inRange(buffers.hsv[0], lower_bound, upper_bound, dst=buffers.mask[0])
+        results.append(_detect_on_mask(buffers.mask[0], object_radius_threshold, detector, buffers.filtered, iterations))
+    return results
+
+
+def _detect_on_mask(mask: cv2.typing.MatLike, object_radius_threshold: int = 2, detector: str = 'contours', work: cv2.typing.MatLike = None, iterations: int = 2) -> tuple[tuple[float], tuple[float]]:
+    '''Remove the small blobs of a color mask, then find the largest object on it.
+    The mask is overwritten by its filtered version.
+
+    :param cv2.typing.MatLike mask: The color mask.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param str detector: The name of the detector finding the object on the mask, see DETECTORS, defaults to 'contours'
+    :param cv2.typing.MatLike work: An image of the mask's size used as an intermediate, defaults to None (new image)
+    :param int iterations: The number of erosions and dilations removing the small blobs, defaults to 2
+    :return tuple[tuple[float], tuple[float]]: A tuple containing two elements, in the mask's coordinates,
+        - The detected circle, in format (x, y, radius) or None
+        - The detected centroid, in format (x, y) or None
+    '''
+    if iterations > 0:
+        work = cv2.erode(mask, None, dst=work, iterations=iterations)
+        cv2.dilate(work, None, dst=mask, iterations=iterations)
+    return DETECTORS[detector](mask, object_radius_threshold)
+
+
+def _largest_contour(mask: cv2.typing.MatLike, object_radius_threshold: int = 2) -> tuple[tuple[float], tuple[float]]:
+    '''Find the largest object on a filtered color mask, from its contour.
+    The circle is the minimum enclosing circle of the contour, and the centroid is computed from its moments.
+
+    :param cv2.typing.MatLike mask: The filtered color mask.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :return tuple[tuple[float], tuple[float]]: A tuple containing two elements, in the mask's coordinates,
+        - The detected circle, in format (x, y, radius) or None
+        - The detected centroid, in format (x, y) or None
+    '''
+    # Find the contours of the object, findContours doesn't modify the mask since OpenCV 3.2
+    contours = imutils.grab_contours(cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
+
+    if len(contours) > 0:
+
+        # Find the largest contour in the mask, then compute the minimum enclosing circle and the centroid
+        c = max(contours, key=cv2.contourArea)
+        (x, y), radius = cv2.minEnclosingCircle(c)
+        m = cv2.moments(c)
+
+        # Only proceed if the radius is above the threshold
+        if radius >= object_radius_threshold and m['m00'] != 0:
+            return (x, y, radius), (m['m10'] / m['m00'], m['m01'] / m['m00'])
+    return None, None
+
+
+def _largest_component(mask: cv2.typing.MatLike, object_radius_threshold: int = 2) -> tuple[tuple[float], tuple[float]]:
+    '''Find the largest object on a filtered color mask, from its connected components.
+    A single call gives the area, bounding box and centroid of every blob. The circle is centered on the
+    bounding box and its radius is half the box's largest side, which matches the minimum enclosing circle
+    of round objects. The centroid is the mean position of the blob's pixels.
+
+    :param cv2.typing.MatLike mask: The filtered color mask.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :return tuple[tuple[float], tuple[float]]: A tuple containing two elements, in the mask's coordinates,
+        - The detected circle, in format (x, y, radius) or None
+        - The detected centroid, in format (x, y) or None
+    '''
+    # 16 bits labels are about twice as fast, they can be used as long as the mask can't have more than 65535 blobs,
+    # which is at most one every two pixels in each direction
+    ltype = cv2.CV_16U if mask.size // 4 < 65535 else cv2.CV_32S
+    count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8, ltype=ltype)
+
+    # The first component is the background
+    if count > 1:
+        i = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        left, top, w, h = (int(v) for v in stats[i, :4])
+        radius = max(w, h) / 2
+        if radius >= object_radius_threshold:
+            return (left + w / 2, top + h / 2, radius), (float(centroids[i, 0]), float(centroids[i, 1]))
+    return None, None
+
+
+# Functions finding the largest object on a filtered color mask, selectable by name
+DETECTORS: dict[str, Callable[[cv2.typing.MatLike, int], tuple[tuple[float], tuple[float]]]] = {
+    'contours': _largest_contour,
+    'components': _largest_component,
+}
+
+
+def _scale_detection(circle: tuple[float], centroid: tuple[float], output_scale: float) -> tuple[tuple[int], tuple[int]]:
+    if circle is None:
+        return None, None
+    return tuple(int(output_scale * v) for v in circle), tuple(int(output_scale * v) for v in centroid)
+
+
+def detect_object(frame: cv2.typing.MatLike, lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, detector: str = 'contours') -> tuple[tuple[int], tuple[int]]:
+    '''Detect the largest object within the given HSV color range on a frame.
+    The intermediate images are preallocated once per thread and reused from one frame to the next.
+
+    :param cv2.typing.MatLike frame: The frame to process, in BGR format.
+    :param tuple[int] lower_bound: Lower HSV bound of the color range.
+    :param tuple[int] upper_bound: Upper HSV bound of the color range.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param int width: The width the frame is resized to before processing, defaults to 600
+    :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+    :param str detector: The name of the detector finding the object on the color mask, see DETECTORS, defaults to 'contours'
+    :return tuple[tuple[int], tuple[int]]: A tuple containing two elements,
+        - The detected circle, in format (x, y, radius) or None
+        - The detected centroid, in format (x, y) or None
+    '''
+    return detect_colored_objects(frame, [(lower_bound, upper_bound)], object_radius_threshold, width, output_scale, detector)[0]
+
+
+def detect_colored_objects(frame: cv2.typing.MatLike, color_bounds: list[tuple[tuple[int], tuple[int]]], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, detector: str = 'contours') -> list[tuple[tuple[int], tuple[int]]]:
+    '''Detect the largest object within each of the given HSV color ranges on a frame.
+    Resizing, blurring and converting the frame to HSV is done once for all the objects.
+
+    :param cv2.typing.MatLike frame: The frame to process, in BGR format.
+    :param list[tuple[tuple[int], tuple[int]]] color_bounds: The lower and upper HSV bounds of the color range of each object.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param int width: The width the frame is resized to before processing, defaults to 600
+    :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+    :param str detector: The name of the detector finding the objects on the color masks, see DETECTORS, defaults to 'contours'
+    :return list[tuple[tuple[int], tuple[int]]]: The detected circle and centroid of each object, see detect_object.
+    '''
+    size = video._scaled_size(frame.shape[1], frame.shape[0], width)
+    buffers = _get_buffers(1, size[1], size[0])
+    # Resize, unless the frame was already decoded at the processing resolution
+    if frame.shape[1] != width:
+        frame = cv2.resize(frame, size, dst=buffers.resized[0], interpolation=cv2.INTER_AREA)
+    return [
+        _scale_detection(circle, centroid, output_scale)
+        for circle, centroid in _find_objects(frame, color_bounds, object_radius_threshold, detector, buffers)
+    ]
+
+
+
+def detect_colored_objects_pyramid(frame: cv2.typing.MatLike, color_bounds: list[tuple[tuple[int], tuple[int]]], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, detector: str = 'contours', coarse_width: int = 160, margin: float = 1.5) -> list[tuple[tuple[int], tuple[int]]]:
+    '''Detect the largest object within each of the given HSV color ranges on a frame, from coarse to fine.
+    The objects are first searched on a small version of the frame, then each one is searched again on a crop
+    of the frame at its own resolution, around the coarse position. The positions have the precision of the
+    given frame for about the cost of processing the small version.
+    The blur and the filtering of the masks are scaled down with the coarse level, so that medium objects survive them.
+    The objects that are not found on the coarse level are searched again on the whole frame at the processing width.
+
+    :param cv2.typing.MatLike frame: The frame to process, in BGR format.
+    :param list[tuple[tuple[int], tuple[int]]] color_bounds: The lower and upper HSV bounds of the color range of each object.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, at the processing width, defaults to 2
+    :param int width: The processing width, in which the coordinates are expressed before output_scale is applied, defaults to 600
+    :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+    :param str detector: The name of the detector finding the objects on the color masks, see DETECTORS, defaults to 'contours'
+    :param int coarse_width: The width of the small version of the frame, defaults to 160
+    :param float margin: The half size of the crops, in radii of the coarse circle, defaults to 1.5
+    :return list[tuple[tuple[int], tuple[int]]]: The detected circle and centroid of each object, see detect_object.
+    '''
+    h, w = frame.shape[:2]
+    coarse_size = video._scaled_size(w, h, min(coarse_width, w))
+    buffers = _get_buffers(1, coarse_size[1], coarse_size[0])
+    coarse = cv2.resize(frame, coarse_size, dst=buffers.resized[0], interpolation=cv2.INTER_AREA)
+    coarse_scale = w / coarse_size[0] # From the coarse level to the frame
+    # The blur kernel and the filtering of the masks are tuned for the processing width
+    level = coarse_size[0] / width
+    blur_size = max(1, int(11 * level)) | 1
+    iterations = round(2 * level)
+    results = _find_objects(coarse, color_bounds, object_radius_threshold * level, detector, buffers, blur_size, iterations)
+
+    # The coordinates on the frame are expressed at the processing width, before output_scale is applied
+    frame_scale = output_scale * width / w
+    detections, missing = [], []
+    for j, ((circle, centroid), (lower_bound, upper_bound)) in enumerate(zip(results, color_bounds)):
+        if circle is None:
+            detections.append((None, None))
+            missing.append(j)
+            continue
+
+        # Refine the position on a crop of the frame, the filters of the mask being applied with some context around it
+        x, y, radius = (v * coarse_scale for v in circle)
+        half_size = margin * radius + 2 * coarse_scale + 10
+        x0, x1 = max(0, int(x - half_size)), min(w, int(x + half_size) + 1)
+        y0, y1 = max(0, int(y - half_size)), min(h, int(y + half_size) + 1)
+        fine_circle, fine_centroid = _find_object(frame[y0:y1, x0:x1], lower_bound, upper_bound, 0, detector, _get_window_buffers(y1 - y0, x1 - x0))
+        if fine_circle is not None:
+            circle = (fine_circle[0] + x0, fine_circle[1] + y0, fine_circle[2])
+            centroid = (fine_centroid[0] + x0, fine_centroid[1] + y0)
+        else:
+            # Keep the coarse position if the object vanished at the full resolution
+            circle, centroid = (x, y, radius), (centroid[0] * coarse_scale, centroid[1] * coarse_scale)
+        detections.append(_scale_detection(circle, centroid, frame_scale))
+
+    # The objects too small for the coarse level are searched at the processing width, like without the pyramid
+    if missing:
+        fallback = detect_colored_objects(frame, [color_bounds[j] for j in missing], object_radius_threshold, width, output_scale, detector)
+        for j, detection in zip(missing, fallback):
+            detections[j] = detection
+    return detections
+
+
+def detect_objects(frames: np.ndarray, color_bounds: list[tuple[tuple[int], tuple[int]]], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, detector: str = 'contours') -> list[list[tuple[tuple[int], tuple[int]]]]:
+    '''Detect the largest object within each of the given HSV color ranges on a block of frames.
+    Gives the same results as detect_colored_objects applied to each frame, but the HSV conversion and
+    the thresholding run once over the whole block instead of once per frame, which removes most
+    of the per-call overhead at low processing widths.
+
+    :param np.ndarray frames: The frames to process, in BGR format, stacked in an array of shape (N, H, W, 3).
+    :param list[tuple[tuple[int], tuple[int]]] color_bounds: The lower and upper HSV bounds of the color range of each object.
+    :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+    :param int width: The width the frames are resized to before processing, defaults to 600
+    :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+    :param str detector: The name of the detector finding the objects on the color masks, see DETECTORS, defaults to 'contours'
+    :return list[list[tuple[tuple[int], tuple[int]]]]: For each frame, the detected circle and centroid of each object, see detect_object.
+    '''
+    if len(frames) == 0:
+        return []
+    n = len(frames)
+    w, h = video._scaled_size(frames.shape[2], frames.shape[1], width)
+    buffers = _get_buffers(n, h, w)
+    # Resize, unless the frames were already decoded at the processing resolution
+    if frames.shape[2] != width:
+        for frame, dst in zip(frames, buffers.resized):
+            cv2.resize(frame, (w, h), dst=dst, interpolation=cv2.INTER_AREA)
+        frames = buffers.resized
+
+    # Blurring depends on the neighbouring pixels, so it is applied to each frame separately
+    for frame, dst in zip(frames, buffers.blurred):
+        cv2.GaussianBlur(frame, (11, 11), 0, dst=dst)
+
+    # The frames are stacked vertically in a single image for the pixel-wise operations
+    cv2.cvtColor(buffers.blurred.reshape(n * h, w, 3), cv2.COLOR_BGR2HSV, dst=buffers.hsv.reshape(n * h, w, 3))
+    results = [[] for _ in range(n)]
+    for lower_bound, upper_bound in color_bounds:
+        cv2.inRange(buffers.hsv.reshape(n * h, w, 3), lower_bound, upper_bound, dst=buffers.mask.reshape(n * h, w))
+        for frame_results, mask in zip(results, buffers.mask):
+            frame_results.append(_scale_detection(*_detect_on_mask(mask, object_radius_threshold, detector, buffers.filtered), output_scale))
+    return results
+
+
+
+class RoiTracker:
+    '''Detect an object by only searching a window around its predicted position.
+
+    Once the object has been found, its position on the next frame is predicted from the previous
+    centroids, either assuming a constant velocity or with a Kalman filter, and the detection only
+    runs on a window around that prediction, sized after the object's radius and speed.
+    The whole frame is searched again when the object can't be found in the window, or when the
+    object found touches the window's border.
+
+    The tracker is stateful: the frames must be given in order, and reset() must be called between two videos.
+    An instance can be used as the detection function of a pipeline, with a single worker.
+    '''
+
+    padding = 10 # Pixels added around the window, so that blurring and filtering the mask give the same result as on the whole frame
+
+    def __init__(self, lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, prediction: str = 'velocity', margin: float = 2, min_window_size: int = 16, detector: str = 'contours') -> None:
+        '''
+        :param tuple[int] lower_bound: Lower HSV bound of the color range.
+        :param tuple[int] upper_bound: Upper HSV bound of the color range.
+        :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+        :param int width: The width the frames are resized to before processing, defaults to 600
+        :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+        :param str prediction: How the next position is predicted, 'velocity' (constant velocity) or 'kalman', defaults to 'velocity'
+        :param float margin: The half size of the window, in object radii, on top of the object's speed, defaults to 2
+        :param int min_window_size: The minimum half size of the window, in pixels at the processing resolution, defaults to 16
+        :param str detector: The name of the detector finding the object on the color mask, see DETECTORS, defaults to 'contours'
+        '''
+        if prediction not in ('velocity', 'kalman'):
+            raise ValueError(f'Unknown prediction method: {prediction}')
+        self.lower_bound, self.upper_bound = lower_bound, upper_bound
+        self.object_radius_threshold = object_radius_threshold
+        self.width = width
+        self.output_scale = output_scale
+        self.prediction = prediction
+        self.margin = margin
+        self.min_window_size = min_window_size
+        self.detector = detector
+        self.reset()
+
+    def __getstate__(self) -> dict:
+        # The Kalman filter can't be pickled, each process starts with a new state instead
+        state = self.__dict__.copy()
+        state['_kalman'] = None
+        state['_last'] = None
+        return state
+
+    def reset(self) -> None:
+        self._last: tuple[float] = None # Last centroid and radius, in format (x, y, radius)
+        self._velocity = (0., 0.)
+        self._kalman: cv2.KalmanFilter = None
+        self.window_searches = 0 # Number of frames processed in a window
+        self.full_searches = 0 # Number of frames processed as a whole
+
+    def __call__(self, frame: cv2.typing.MatLike) -> tuple[tuple[int], tuple[int]]:
+        size = video._scaled_size(frame.shape[1], frame.shape[0], self.width)
+        buffers = _get_buffers(1, size[1], size[0])
+        if frame.shape[1] != self.width:
+            frame = cv2.resize(frame, size, dst=buffers.resized[0], interpolation=cv2.INTER_AREA)
+
+        circle, centroid = None, None
+        prediction = self._predict()
+        if prediction is not None:
+            circle, centroid = self._search_window(frame, *prediction)
+        if circle is None:
+            self.full_searches += 1
+            circle, centroid = _find_object(frame, self.lower_bound, self.upper_bound, self.object_radius_threshold, self.detector, buffers)
+        self._update(circle, centroid)
+        return _scale_detection(circle, centroid, self.output_scale)
+
+    def _predict(self) -> tuple[float]:
+        '''Return the predicted position of the object and the half size of the window to search, or None if the object was lost.'''
+        if self._last is None:
+            return None
+        if self._kalman is not None:
+            x, y, vx, vy = self._kalman.predict().flatten()
+        else:
+            vx, vy = self._velocity
+            x, y = self._last[0] + vx, self._last[1] + vy
+        half_size = max(self.min_window_size, self.margin * self._last[2] + max(abs(vx), abs(vy)))
+        return x, y, half_size
+
+    def _search_window(self, frame: cv2.typing.MatLike, x: float, y: float, half_size: float) -> tuple[tuple[float], tuple[float]]:
+        h, w = frame.shape[:2]
+        x0, x1 = max(0, int(x - half_size)), min(w, int(x + half_size) + 1)
+        y0, y1 = max(0, int(y - half_size)), min(h, int(y + half_size) + 1)
+        if x0 >= x1 or y0 >= y1:
+            return None, None # The prediction is out of the frame
+        self.window_searches += 1
+
+        # Search the padded window, the padding is only there to give context to the filters
+        px0, px1 = max(0, x0 - self.padding), min(w, x1 + self.padding)
+        py0, py1 = max(0, y0 - self.padding), min(h, y1 + self.padding)
+        circle, centroid = _find_object(frame[py0:py1, px0:px1], self.lower_bound, self.upper_bound, self.object_radius_threshold, self.detector, _get_window_buffers(py1 - py0, px1 - px0))
+        if circle is None:
+            return None, None
+        cx, cy, radius = circle[0] + px0, circle[1] + py0, circle[2]
+
+        # An object crossing the window's border may be cut, or may not be the largest one of the frame
+        if (cx - radius < x0 and x0 > 0) or (cx + radius > x1 and x1 < w) or (cy - radius < y0 and y0 > 0) or (cy + radius > y1 and y1 < h):
+            return None, None
+        return (cx, cy, radius), (centroid[0] + px0, centroid[1] + py0)
+
+    def _update(self, circle: tuple[float], centroid: tuple[float]) -> None:
+        if circle is None:
+            # The object was lost, the next frame is searched as a whole
+            self._last, self._velocity, self._kalman = None, (0., 0.), None
+            return
+
+        x, y = centroid
+        if self.prediction == 'kalman':
+            if self._kalman is None:
+                self._kalman = self._create_kalman_filter(x, y)
+            else:
+                self._kalman.correct(np.array([[x], [y]], dtype=np.float32))
+        elif self._last is not None:
+            self._velocity = (x - self._last[0], y - self._last[1])
+        self._last = (x, y, circle[2])
+
+    def _create_kalman_filter(self, x: float, y: float) -> cv2.KalmanFilter:
+        # Constant velocity model, the state being (x, y, vx, vy)
+        kalman = cv2.KalmanFilter(4, 2)
+        kalman.transitionMatrix = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float32)
+        kalman.measurementMatrix = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float32)
+        kalman.processNoiseCov = np.eye(4, dtype=np.float32) * 1e-1
+        kalman.measurementNoiseCov = np.eye(2, dtype=np.float32) * 1e-1
+        kalman.errorCovPost = np.eye(4, dtype=np.float32)
+        kalman.statePost = np.array([[x], [y], [0], [0]], dtype=np.float32)
+        return kalman
+
+
+
+class FlowTracker:
+    '''Follow an object with sparse optical flow, only running the color detection on keyframes.
+
+    On a keyframe, the object is found by the color detection, and up to max_points feature points are
+    picked on it. On the next frames, these points are followed with the pyramidal Lucas-Kanade optical flow,
+    each point being tracked forward and then backward: the points that don't come back to where they started
+    are dropped. The object moves by the median displacement of the remaining points, and keeps its radius.
+
+    The confidence of the tracking is the fraction of the keyframe's points still followed. The color detection
+    runs again when it drops below min_confidence, after keyframe_interval frames, or when the object leaves the frame.
+    The confidence is returned along with each detection, as its third element.
+    The tracker is stateful: the frames must be given in order, and reset() must be called between two videos.
+    An instance can be used as the detection function of a pipeline, with a single worker.
+    '''
+
+    lk_params = {
+        'winSize': (15, 15),
+        'maxLevel': 2,
+        'criteria': (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, .03),
+    }
+
+    def __init__(self, lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1, keyframe_interval: int = 30, min_confidence: float = .5, max_points: int = 20, max_error: float = 1, detector: str = 'contours') -> None:
+        '''
+        :param tuple[int] lower_bound: Lower HSV bound of the color range.
+        :param tuple[int] upper_bound: Upper HSV bound of the color range.
+        :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
+        :param int width: The width the frames are resized to before processing, defaults to 600
+        :param float output_scale: The factor applied to the returned coordinates, to express them in another resolution, defaults to 1
+        :param int keyframe_interval: The maximum number of frames between two color detections, defaults to 30
+        :param float min_confidence: The fraction of followed points below which the object is detected again, defaults to .5
+        :param int max_points: The maximum number of feature points followed on the object, defaults to 20
+        :param float max_error: The distance, in pixels at the processing resolution, above which a point tracked forward and backward is dropped, defaults to 1
+        :param str detector: The name of the detector finding the object on the color mask, see DETECTORS, defaults to 'contours'
+        '''
+        self.lower_bound, self.upper_bound = lower_bound, upper_bound
+        self.object_radius_threshold = object_radius_threshold
+        self.width = width
+        self.output_scale = output_scale
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence
+        self.max_points = max_points
+        self.max_error = max_error
+        self.detector = detector
+        self.reset()
+
+    def __getstate__(self) -> dict:
+        # Each process starts with a new state, beginning with a keyframe
+        state = self.__dict__.copy()
+        state['_gray'] = state['_previous_gray'] = state['_points'] = state['_last'] = None
+        return state
+
+    def reset(self) -> None:
+        self._last: tuple[float] = None # Last centroid and radius, in format (x, y, radius)
+        self._points: np.ndarray = None # Points followed on the object, in format (N, 1, 2)
+        self._seeded_count = 0 # Number of points picked on the last keyframe
+        self._since_keyframe = 0
+        self._gray: np.ndarray = None
+        self._previous_gray: np.ndarray = None
+        self.confidence: float = 0. # Confidence of the last position, 1 on keyframes, 0 when the object is lost
+        self.detections = 0 # Number of frames where the color detection ran
+        self.flow_updates = 0 # Number of frames where the object was followed with the optical flow
+
+    def __call__(self, frame: cv2.typing.MatLike) -> tuple[tuple[int], tuple[int], float]:
+        size = video._scaled_size(frame.shape[1], frame.shape[0], self.width)
+        buffers = _get_buffers(1, size[1], size[0])
+        if frame.shape[1] != self.width:
+            frame = cv2.resize(frame, size, dst=buffers.resized[0], interpolation=cv2.INTER_AREA)
+
+        # The two grayscale images are swapped instead of being allocated on each frame
+        self._gray, self._previous_gray = self._previous_gray, self._gray
+        if self._gray is None or self._gray.shape != frame.shape[:2]:
+            self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        circle, centroid = None, None
+        if self._last is not None and self._since_keyframe < self.keyframe_interval:
+            circle, centroid = self._follow()
+        if circle is None:
+            circle, centroid = self._detect(frame, buffers)
+        return *_scale_detection(circle, centroid, self.output_scale), self.confidence
+
+    def _window(self, x: float, y: float, radius: float) -> tuple[int, int, int, int]:
+        '''Return the region of the grayscale images around the object, in format (x0, y0, x1, y1).
+        Building the pyramids of the optical flow on this region only is much cheaper than on the whole images.
+        '''
+        h, w = self._gray.shape
+        half_size = 2 * radius + self.lk_params['winSize'][0] * 2 ** self.lk_params['maxLevel'] // 2
+        return max(0, int(x - half_size)), max(0, int(y - half_size)), min(w, int(x + half_size) + 1), min(h, int(y + half_size) + 1)
+
+    def _follow(self) -> tuple[tuple[float], tuple[float]]:
+        '''Move the object by the optical flow of its points, or return None if the confidence is too low.'''
+        x0, y0, x1, y1 = self._window(*self._last)
+        previous, current = self._previous_gray[y0:y1, x0:x1], self._gray[y0:y1, x0:x1]
+        start = self._points - np.array([x0, y0], dtype=np.float32)
+        points, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, start, None, **self.lk_params)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(current, previous, points, None, **self.lk_params)
+        error = np.linalg.norm((back - start).reshape(-1, 2), axis=1)
+        kept = (status.ravel() == 1) & (back_status.ravel() == 1) & (error <= self.max_error)
+
+        self.confidence = int(kept.sum()) / self._seeded_count
+        if self.confidence < self.min_confidence:
+            return None, None
+        dx, dy = np.median((points - start).reshape(-1, 2)[kept], axis=0)
+        x, y, radius = self._last[0] + float(dx), self._last[1] + float(dy), self._last[2]
+        h, w = self._gray.shape
+        if not (0 <= x < w and 0 <= y < h):
+            return None, None
+
+        self.flow_updates += 1
+        self._since_keyframe += 1
+        self._points = points[kept] + np.array([x0, y0], dtype=np.float32)
+        self._last = (x, y, radius)
+        return (x, y, radius), (x, y)
+
+    def _detect(self, frame: cv2.typing.MatLike, buffers: _Buffers) -> tuple[tuple[float], tuple[float]]:
+        '''Find the object with the color detection, and pick the points to follow on it.'''
+        self.detections += 1
+        self._since_keyframe = 0
+        circle, centroid = _find_object(frame, self.lower_bound, self.upper_bound, self.object_radius_threshold, self.detector, buffers)
+        self._last, self._points, self.confidence = None, None, 0.
+        if circle is None:
+            return None, None
+
+        # The points are picked on the object and on its outline, where the contrast is the highest
+        x0, y0, x1, y1 = self._window(*circle)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.circle(mask, (int(circle[0]) - x0, int(circle[1]) - y0), int(circle[2]) + 2, 255, -1)
+        points = cv2.goodFeaturesToTrack(self._gray[y0:y1, x0:x1], self.max_points, .01, 3, mask=mask)
+        if points is not None and len(points) >= 3:
+            self._points = points.astype(np.float32) + np.array([x0, y0], dtype=np.float32)
+            self._seeded_count = len(points)
+            self._last = (centroid[0], centroid[1], circle[2])
+        self.confidence = 1.
+        return circle, centroid
+
+
+
+class MultiObjectTracker:
+    '''Track several objects, each with its own RoiTracker or FlowTracker, resizing each frame only once for all of them.'''
+
+    def __init__(self, trackers: list[RoiTracker | FlowTracker]) -> None:
+        '''
+        :param list[RoiTracker | FlowTracker] trackers: The tracker of each object, all working at the same processing width.
+        '''
+        self.trackers = trackers
+        self.width = trackers[0].width
+
+    def reset(self) -> None:
+        for tracker in self.trackers:
+            tracker.reset()
+
+    def __call__(self, frame: cv2.typing.MatLike) -> list[tuple]:
+        if frame.shape[1] != self.width:
+            # The trackers only write to the resized buffer when they have to resize the frame themselves
+            size = video._scaled_size(frame.shape[1], frame.shape[0], self.width)
+            frame = cv2.resize(frame, size, dst=_get_buffers(1, size[1], size[0]).resized[0], interpolation=cv2.INTER_AREA)
+        return [tracker(frame) for tracker in self.trackers]
+
+
+
+# Status of each frame in the results of a pipeline
+STATUS_PROCESSED = 'processed' # The detection function was applied to the frame
+STATUS_STATIC = 'static' # The frame didn't change since the last processed frame, whose results were reused
+STATUS_SKIPPED = 'skipped' # The frame was left out by the stride of the pipeline, it has no results
+STATUS_INTERPOLATED = 'interpolated' # Some of the positions of the frame were interpolated from the surrounding frames, see Trajectory.interpolate
+STATUS_DUPLICATE = 'duplicate' # The frame is a copy of the previous one, whose results were reused
+
+
+
+def _tiny_gray(frame: cv2.typing.MatLike, width: int) -> np.ndarray:
+    '''Return a grayscale version of a frame, halved until it is less than twice the given width.'''
+    small = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    while small.shape[1] >= 2 * width:
+        small = cv2.resize(small, (small.shape[1] // 2, small.shape[0] // 2), interpolation=cv2.INTER_LINEAR)
+    return small
+
+
+
+class MotionGate:
+    '''Tell whether a frame changed since the last frame that was processed.
+
+    The frames are compared on tiny grayscale versions of them, where noise and compression artifacts are averaged out,
+    so that the comparison costs a small fraction of a detection. They are obtained by halving the frames several times,
+    each halving averaging blocks of 2x2 pixels, which is much cheaper than resizing them in one step. Comparing to the last processed frame rather than to
+    the previous one ensures that slow movements are caught once they add up.
+    The gate is stateful: the frames must be given in order, and reset() must be called between two videos.
+    '''
+
+    def __init__(self, threshold: int = 8, width: int = 64) -> None:
+        '''
+        :param int threshold: The difference of intensity, between 0 and 255, above which a pixel of the tiny version is considered changed, defaults to 8
+        :param int width: The minimum width of the tiny versions of the frames, which are less than twice as large, defaults to 64
+        '''
+        self.threshold = threshold
+        self.width = width
+        self.reset()
+
+    def reset(self) -> None:
+        self._reference: np.ndarray = None
+
+    def __call__(self, frame: cv2.typing.MatLike) -> bool:
+        '''Return True if the frame changed since the last processed frame, which it then becomes.'''
+        small = _tiny_gray(frame, self.width)
+        if self._reference is not None and cv2.absdiff(small, self._reference).max() <= self.threshold:
+            return False
+        self._reference = small
+        return True
+
+
+
+class DuplicateDetector:
+    '''Tell whether a frame is a copy of the previous one.
+
+    Variable frame rate recordings are padded to a constant frame rate by repeating frames, which are either exact copies
+    or, once re-encoded, copies up to compression noise. Unlike MotionGate, frames are compared to the previous frame on
+    grayscale versions close to the processing resolution, by their mean difference: the noise of the sensor changes a large part
+    of the pixels of a static scene from one frame to the next, while a repeated frame differs by a level on a few pixels at most.
+    Static frames are thus left to the motion gate, only the exact and near-exact repeats are duplicates.
+    Padding repeats a frame a few times at most: the frames of longer runs of repeats, as in the static scenes of noise-free videos,
+    are static rather than duplicates, see the repeats attribute.
+    The detector is stateful: the frames must be given in order, and reset() must be called between two videos.
+    '''
+
+    def __init__(self, threshold: float = .02, width: int = 320, max_repeats: int = 3) -> None:
+        '''
+        :param float threshold: The mean difference of intensity, between 0 and 255, up to which two frames are considered equal, defaults to .02
+        :param int width: The minimum width of the grayscale versions of the frames, which are less than twice as large, defaults to 320
+        :param int max_repeats: The number of times a frame can be repeated in a row by padding, defaults to 3
+        '''
+        self.threshold = threshold
+        self.width = width
+        self.max_repeats = max_repeats
+        self.reset()
+
+    def reset(self) -> None:
+        self._previous: np.ndarray = None
+        self.repeats = 0 # Number of copies of the same frame in a row, up to the last one given
+
+    def __call__(self, frame: cv2.typing.MatLike) -> bool:
+        '''Return True if the frame is a copy of the previous one.'''
+        small = _tiny_gray(frame, self.width)
+        duplicate = self._previous is not None and cv2.norm(small, self._previous, cv2.NORM_L1) / small.size <= self.threshold
+        self.repeats = self.repeats + 1 if duplicate else 0
+        self._previous = small
+        return duplicate
+
+
+
+
+class DetectionPipeline:
+    '''Run a detection function over all the frames of a video, overlapping decoding and detection.
+
+    A decoder thread reads the frames sequentially and pushes them into a bounded queue,
+    from which several worker threads pull the frames to process. OpenCV releases the GIL
+    while working, so decoding and detection effectively run in parallel and the total
+    time is close to the slowest of the two stages instead of their sum.
+
+    With a batch size, consecutive frames are grouped in blocks of shape (N, H, W, 3), and the
+    detection function is called once per block, returning a list of results (see detect_objects).
+
+    With a motion gate, the frames that didn't change since the last processed frame are not processed,
+    they get the results of that frame instead, and are marked as static in the statuses.
+
+    With a stride, only every stride-th frame is decoded and processed, the other ones are marked as
+    skipped and have None as results, their positions can be filled afterwards with Trajectory.interpolate.
+
+    With a duplicate detector, the frames that are copies of the previous one are not processed either,
+    they get the results of the previous frame, and are marked as duplicates in the statuses.
+
+    With a running event, the decoding and the detection threads wait before each frame while it is cleared,
+    so that pausing the job running the pipeline pauses the work itself, and not only its progress reports.
+    '''
+
+    def __init__(self, source: video.FrameSource, detect: Callable[[cv2.typing.MatLike], tuple], workers: int = None, queue_size: int = 32, batch_size: int = None, motion_gate: MotionGate = None, stride: int = 1, duplicate_detector: DuplicateDetector = None, running: threading.Event = None) -> None:
+        '''
+        :param video.FrameSource source: The source of the frames to process.
+        :param Callable detect: The function applied to each frame, its results are gathered in frame order.
+        :param int workers: The number of detection threads, defaults to None (number of CPUs)
+        :param int queue_size: The maximum number of decoded frames waiting to be processed, defaults to 32
+        :param int batch_size: The number of frames given at once to the detection function, defaults to None (frame by frame)
+        :param MotionGate motion_gate: Skips the frames that didn't change, defaults to None (every frame is processed)
+        :param int stride: Only every stride-th frame is processed, defaults to 1
+        :param DuplicateDetector duplicate_detector: Skips the frames that are copies of the previous one, defaults to None (duplicates are processed)
+        :param threading.Event running: The process is paused while this event is cleared, defaults to None (never paused)
+        '''
+        self.source = source
+        self.detect = detect
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.motion_gate = motion_gate
+        self.stride = max(1, stride)
+        self.duplicate_detector = duplicate_detector
+        self.running = running
+
+        self.results: list = []
+        self.statuses: list[str] = [] # Status of each frame, see the STATUS_* constants
+        self.processed_count = 0
+        self.decoded_count = 0
+        self.latest: tuple[int, cv2.typing.MatLike, tuple] = None # Last processed (index, frame, result), used for previews
+
+        self._frames_queue: queue.Queue = None
+        self._lock = threading.Lock()
+        self._error: BaseException = None
+        self._stop = threading.Event()
+
+    def run(self, on_progress: Callable[[int, int], None] = None, poll_interval: float = .05) -> list:
+        '''Process all the frames and return the results in frame order.
+        This method blocks until the end of the process, calling on_progress from the calling thread in the meantime.
+        If on_progress raises an exception, the process is stopped and the exception is propagated once the threads have ended,
+        so that the frame source is not read anymore when this method returns, whatever its outcome.
+
+        :param Callable[[int, int], None] on_progress: Called with the number of processed frames and the total number of frames, defaults to None
+        :param float poll_interval: The time between two calls to on_progress, in seconds, defaults to .05
+        :return list: The results of the detection function, one for each frame up to the last processed one, None for the skipped frames.
+        '''
+        self.results = [None] * len(self.source)
+        self.statuses = [STATUS_PROCESSED if i % self.stride == 0 else STATUS_SKIPPED for i in range(len(self.source))]
+        self._frames_queue = queue.Queue(maxsize=max(1, self.queue_size // (self.batch_size or 1)))
+        self._stop.clear()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.duplicate_detector is not None:
+            self.duplicate_detector.reset()
+
+        threads = self._create_threads()
+        for t in threads:
+            t.start()
+
+        try:
+            while any(t.is_alive() for t in threads):
+                threads[-1].join(poll_interval)
+                if on_progress is not None:
+                    on_progress(self.processed_count, len(self.results))
+            if on_progress is not None:
+                on_progress(self.processed_count, len(self.results))
+        except BaseException:
+            # on_progress may interrupt the process, e.g. when the job running it is cancelled
+            self._stop.set()
+            for t in threads:
+                t.join()
+            raise
+
+        if self._error is not None:
+            raise self._error
+        # The frame count given by the container can be overestimated
+        del self.results[self.decoded_count:]
+        del self.statuses[self.decoded_count:]
+
+        # Static and duplicate frames get the results of the last processed frame
+        last = None
+        for i in range(len(self.results)):
+            if self.statuses[i] in (STATUS_STATIC, STATUS_DUPLICATE):
+                self.results[i] = last
+            elif self.statuses[i] == STATUS_PROCESSED:
+                last = self.results[i]
+        return self.results
+
+    def active_window(self) -> tuple[int, int]:
+        '''Return the range of frames where something moves, according to the motion gate, once the pipeline has run.
+        The window starts on the last frame before the first movement, so that the initial state is kept.
+
+        :return tuple[int, int]: The index of the first frame of the window, and the index after its last frame.
+        '''
+        # Apart from the first frame, which is always processed, processed frames are the ones that changed
+        sampled = [i for i in range(len(self.statuses)) if self.statuses[i] != STATUS_SKIPPED]
+        moving = [k for k in range(1, len(sampled)) if self.statuses[sampled[k]] == STATUS_PROCESSED]
+        if not moving:
+            return 0, len(self.statuses)
+        return sampled[moving[0] - 1], sampled[moving[-1]] + 1
+
+    def _wait_while_paused(self) -> None:
+        '''Block while the running event is cleared, unless the process is stopped meanwhile.'''
+        if self.running is None:
+            return
+        while not self.running.wait(.05) and not self._stop.is_set():
+            pass
+
+    def _create_threads(self) -> list[threading.Thread]:
+        threads = [threading.Thread(target=self._decode, daemon=True)]
+        threads += [threading.Thread(target=self._process, daemon=True) for _ in range(self.workers)]
+        return threads
+
+    def _frames_to_process(self) -> Iterator[tuple[int, cv2.typing.MatLike]]:
+        '''Decode the frames sequentially, and yield the ones that must be processed with their index.'''
+        for k, frame in enumerate(self.source.iter_frames(step=self.stride)):
+            self._wait_while_paused()
+            if self._stop.is_set():
+                break
+            i = k * self.stride
+            while i >= len(self.results):
+                self.results.append(None)
+                self.statuses.append(STATUS_PROCESSED if len(self.statuses) % self.stride == 0 else STATUS_SKIPPED)
+            self.decoded_count = i + 1
+            if k > 0:
+                with self._lock:
+                    self.processed_count += self.stride - 1 # The frames skipped since the previous one
+            if self.duplicate_detector is not None and self.duplicate_detector(frame):
+                repeats = self.duplicate_detector.repeats
+                if repeats <= self.duplicate_detector.max_repeats:
+                    self.statuses[i] = STATUS_DUPLICATE
+                else:
+                    # Too many repeats for padding, the scene is static, including the repeats already flagged as duplicates
+                    if repeats == self.duplicate_detector.max_repeats + 1:
+                        for r in range(1, repeats):
+                            self.statuses[i - r * self.stride] = STATUS_STATIC
+                    self.statuses[i] = STATUS_STATIC
+                with self._lock:
+                    self.processed_count += 1
+                continue
+            if self.motion_gate is not None and not self.motion_gate(frame):
+                self.statuses[i] = STATUS_STATIC
+                with self._lock:
+                    self.processed_count += 1
+                continue
+            yield i, frame
+
+    def _decode(self) -> None:
+        try:
+            block, indexes = [], []
+            for i, frame in self._frames_to_process():
+                if self.batch_size is None:
+                    self._frames_queue.put(([i], frame))
+                    continue
+                block.append(frame)
+                indexes.append(i)
+                if len(block) == self.batch_size:
+                    self._frames_queue.put((indexes, np.stack(block)))
+                    block, indexes = [], []
+            if block and not self._stop.is_set():
+                self._frames_queue.put((indexes, np.stack(block)))
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.workers):
+                self._frames_queue.put(None)
+
+    def _process(self) -> None:
+        while True:
+            item = self._frames_queue.get()
+            if item is None:
+                break
+            self._wait_while_paused()
+            if self._stop.is_set():
+                continue
+            indexes, frames = item
+            try:
+                results = self.detect(frames) if self.batch_size is not None else [self.detect(frames)]
+            except BaseException as e:
+                self._fail(e)
+                continue
+            for i, result in zip(indexes, results):
+                self.results[i] = result
+            with self._lock:
+                self.processed_count += len(results)
+                self.latest = (indexes[-1], frames[-1] if self.batch_size is not None else frames, results[-1])
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+
+
+def _detect_shared_frames(shm_name: str, shape: tuple[int], detect: Callable[[cv2.typing.MatLike], tuple], batch: bool = False) -> list:
+    '''Apply the detection function to a block of frames stored in shared memory.
+    This function is executed in the worker processes of ProcessPoolDetectionPipeline.
+
+    :param str shm_name: The name of the shared memory block.
+    :param tuple[int] shape: The shape of the block of frames, in format (N, H, W, 3).
+    :param Callable detect: The function applied to each frame.
+    :param bool batch: Whether the detection function takes the whole block at once, defaults to False
+    :return list: The results of the detection function, one for each frame.
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        if batch:
+            return list(detect(frames))
+        return [detect(frame) for frame in frames]
+    finally:
+        del frames # The buffer can't be closed while an array still references it
+        shm.close()
+
+
+
+class ProcessPoolDetectionPipeline(DetectionPipeline):
+    '''Run a detection function over all the frames of a video, in a pool of processes.
+
+    The frames are decoded in the calling process and grouped in chunks of frames,
+    each chunk being written to a shared memory block instead of being pickled to the worker
+    processes. The results of each chunk are then merged back in frame order.
+    The detection function must be picklable (a module-level function or a functools.partial of one).
+    With a batch size, the chunks are made of batch_size frames, each given at once to the detection function.
+    While paused, no new chunk is submitted, the chunks already submitted are completed.
+    '''
+
+    def __init__(self, source: video.FrameSource, detect: Callable[[cv2.typing.MatLike], tuple], workers: int = None, chunk_size: int = 8, batch_size: int = None, motion_gate: MotionGate = None, stride: int = 1, duplicate_detector: DuplicateDetector = None, running: threading.Event = None) -> None:
+        '''
+        :param video.FrameSource source: The source of the frames to process.
+        :param Callable detect: The function applied to each frame, its results are gathered in frame order.
+        :param int workers: The number of worker processes, defaults to None (number of CPUs)
+        :param int chunk_size: The number of frames sent to a worker at once, defaults to 8
+        :param int batch_size: The number of frames given at once to the detection function, replacing chunk_size, defaults to None (frame by frame)
+        :param MotionGate motion_gate: Skips the frames that didn't change, defaults to None (every frame is processed)
+        :param int stride: Only every stride-th frame is processed, defaults to 1
+        :param DuplicateDetector duplicate_detector: Skips the frames that are copies of the previous one, defaults to None (duplicates are processed)
+        :param threading.Event running: The process is paused while this event is cleared, defaults to None (never paused)
+        '''
+        super().__init__(source, detect, workers, batch_size=batch_size, motion_gate=motion_gate, stride=stride, duplicate_detector=duplicate_detector, running=running)
+        self.chunk_size = batch_size or chunk_size
+
+    def _create_threads(self) -> list[threading.Thread]:
+        return [threading.Thread(target=self._dispatch, daemon=True)]
+
+    def _dispatch(self) -> None:
+        # Limit the number of chunks in flight so that memory usage stays bounded
+        slots = threading.Semaphore(2 * self.workers)
+        futures = []
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                chunk, indexes = [], []
+                for i, frame in self._frames_to_process():
+                    chunk.append(frame)
+                    indexes.append(i)
+                    if len(chunk) == self.chunk_size:
+                        slots.acquire()
+                        futures.append(self._submit(executor, chunk, indexes, slots))
+                        chunk, indexes = [], []
+                if chunk and not self._stop.is_set():
+                    slots.acquire()
+                    futures.append(self._submit(executor, chunk, indexes, slots))
+                concurrent.futures.wait(futures)
+        except BaseException as e:
+            self._fail(e)
+
+    def _submit(self, executor: concurrent.futures.ProcessPoolExecutor, chunk: list[cv2.typing.MatLike], indexes: list[int], slots: threading.Semaphore) -> concurrent.futures.Future:
+        shape = (len(chunk), *chunk[0].shape)
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        for j, frame in enumerate(chunk):
+            frames[j] = frame
+        del frames
+
+        def on_done(future: concurrent.futures.Future) -> None:
+            try:
+                results = future.result()
+                for i, result in zip(indexes, results):
+                    self.results[i] = result
+                with self._lock:
+                    self.processed_count += len(results)
+                    self.latest = (indexes[-1], chunk[-1], results[-1])
+            except BaseException as e:
+                self._fail(e)
+            finally:
+                shm.close()
+                shm.unlink()
+                slots.release()
+
+        future = executor.submit(_detect_shared_frames, shm.name, shape, self.detect, self.batch_size is not None)
+        future.add_done_callback(on_done)
+        return future
@@ -36,10 +36,86 @@ class IconsEnum:
 
 
 
+class SettingsEnum:
+
+    DECODE_MODE: str # lazy | store | segmented | compressed
+    DECODE_WORKERS: int # 0 means one worker per CPU
+    FRAME_COMPRESSION: str # png | jpeg | lz4
+    PROCESSING_WIDTH: int
+    FRAME_CACHE: bool
+    CACHE_DIRECTORY: str
+    CACHE_SIZE_LIMIT: int # In megabytes
+    DETECTION_MODE: str # threads | processes
+    DETECTION_WORKERS: int # 0 means one worker per CPU
+    DETECTION_REGION: str # full | roi | pyramid | flow
+    PYRAMID_WIDTH: int
+    ROI_PREDICTION: str # velocity | kalman
+    FLOW_KEYFRAME_INTERVAL: int
+    FLOW_MIN_CONFIDENCE: float
+    DETECTION_BATCH_SIZE: int # 0 means frame by frame
+    DETECTOR: str # contours | components
+    MOTION_GATING: bool
+    MOTION_THRESHOLD: int
+    MOTION_TRIM: bool
+    DETECTION_STRIDE: int
+    INTERPOLATION: str # none | linear | cubic
+    INTERPOLATION_MAX_GAP: int
+    DUPLICATE_DETECTION: bool
+    DUPLICATE_THRESHOLD: float
+    DUPLICATE_MAX_REPEATS: int
+    DROP_DUPLICATES: bool
+    AXIS_ROTATION: float
+    FLIP_X_AXIS: bool
+    CAMERA_PROFILE: str # Empty for none
+    CAMERA_PROFILE_DIRECTORY: str
+    CHECKERBOARD_COLUMNS: int
+    CHECKERBOARD_ROWS: int
+
+    def __init__(self, config: configparser.ConfigParser) -> None:
+        self.DECODE_MODE = config.get('object_detection', 'decode_mode')
+        self.DECODE_WORKERS = config.getint('object_detection', 'decode_workers')
+        self.FRAME_COMPRESSION = config.get('object_detection', 'frame_compression')
+        self.PROCESSING_WIDTH = config.getint('object_detection', 'processing_width')
+        self.FRAME_CACHE = config.getboolean('object_detection', 'frame_cache')
+        self.CACHE_DIRECTORY = config.get('object_detection', 'cache_directory')
+        self.CACHE_SIZE_LIMIT = config.getint('object_detection', 'cache_size_limit')
+        self.DETECTION_MODE = config.get('object_detection', 'detection_mode')
+        self.DETECTION_WORKERS = config.getint('object_detection', 'detection_workers')
+        self.DETECTION_REGION = config.get('object_detection', 'detection_region')
+        self.PYRAMID_WIDTH = config.getint('object_detection', 'pyramid_width')
+        self.ROI_PREDICTION = config.get('object_detection', 'roi_prediction')
+        self.FLOW_KEYFRAME_INTERVAL = config.getint('object_detection', 'flow_keyframe_interval')
+        self.FLOW_MIN_CONFIDENCE = config.getfloat('object_detection', 'flow_min_confidence')
+        self.DETECTION_BATCH_SIZE = config.getint('object_detection', 'detection_batch_size')
+        self.DETECTOR = config.get('object_detection', 'detector')
+        self.MOTION_GATING = config.getboolean('object_detection', 'motion_gating')
+        self.MOTION_THRESHOLD = config.getint('object_detection', 'motion_threshold')
+        self.MOTION_TRIM = config.getboolean('object_detection', 'motion_trim')
+        self.DETECTION_STRIDE = config.getint('object_detection', 'detection_stride')
+        self.INTERPOLATION = config.get('object_detection', 'interpolation')
+        self.INTERPOLATION_MAX_GAP = config.getint('object_detection', 'interpolation_max_gap')
+        self.DUPLICATE_DETECTION = config.getboolean('object_detection', 'duplicate_detection')
+        self.DUPLICATE_THRESHOLD = config.getfloat('object_detection', 'duplicate_threshold')
+        self.DUPLICATE_MAX_REPEATS = config.getint('object_detection', 'duplicate_max_repeats')
+        self.DROP_DUPLICATES = config.getboolean('object_detection', 'drop_duplicates')
+        self.AXIS_ROTATION = config.getfloat('object_detection', 'axis_rotation')
+        self.FLIP_X_AXIS = config.getboolean('object_detection', 'flip_x_axis')
+        self.CAMERA_PROFILE = config.get('object_detection', 'camera_profile')
+        self.CAMERA_PROFILE_DIRECTORY = config.get('object_detection', 'camera_profile_directory')
+        self.CHECKERBOARD_COLUMNS = config.getint('object_detection', 'checkerboard_columns')
+        self.CHECKERBOARD_ROWS = config.getint('object_detection', 'checkerboard_rows')
+
+
+
 class LanguagePackEnum:
 
     LANGUAGE: str
     APP_VERSION: str # Replace {{?}} with app version
+    class jobs:
+        CANCEL: str
+        PAUSE: str
+        RESUME: str
+        ERROR: str
     class submenus_names:
         VIDEO_ANALYSIS: str
         UNCERTAINTY_TOOLS: str
@@ -49,16 +125,33 @@ class LanguagePackEnum:
         LOADING_FRAMES: str
         PROCESSING_FRAMES: str
         CONVERTING_COORDINATES: str
+        CALIBRATING_CAMERA: str
+        OBJECT_NAME: str # Replace {{?}} with the object's number
         class file_input_frame:
             TITLE: str
             SELECT_FILE: str
             SUPPORTED_FORMATS: str
             BUTTON_TEXT: str
+        class camera_calibration_frame:
+            TITLE: str
+            SELECT_FILE: str
+            TEXT: str # Replace {{?}} with the camera's name
+            NOT_FOUND: str
+            BUTTON_TEXT: str
+        class time_window_selector_frame:
+            TITLE: str
+            START: str
+            END: str
+            NEXT: str
+            WHOLE_VIDEO: str
         class scale_selector_frame:
             TITLE: str
             SELECT_FIRST_POINT: str
             SELECT_SECOND_POINT: str
             ENTER_DISTANCE: str
+            CORRECT_PERSPECTIVE: str
+            SELECT_CORNERS: str
+            ENTER_SIZE: str
             NEXT: str
             CHANGE_IMAGE: str
         class origin_selector_frame:
@@ -74,6 +167,7 @@ class LanguagePackEnum:
             LOWER_BOUND: str # Replace {{?}} with parameter (H|S|V)
             NEXT: str
             CHANGE_IMAGE: str
+            ADD_OBJECT: str
         class save_frame:
             TITLE: str
             SAVE_OPTIONS: str
@@ -86,9 +180,14 @@ class LanguagePackEnum:
             INVERT_Y_AXIS: str
             SAVE: str
             TIME_COLUMN_NAME: str
+            INCLUDE_STATUS: str
+            STATUS_COLUMN_NAME: str
+            CONFIDENCE_COLUMN_NAME: str
+            OPTIONAL_FORMATS: str
     class minmax_slopes:
         DISPLAY_NAME: str
         TITLE: str
+        COMPUTING_SLOPES: str
         class file_input_frame:
             TITLE: str
             SELECT_FILE: str
@@ -0,0 +1,110 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+try:
+    import tables
+except ImportError:
+    tables = None
+
+
+
+# Binary columnar formats, which keep the types of the columns and are compressed, unlike the text and spreadsheet formats
+columnar_file_extensions = ['.npz'] + (['.parquet', '.feather'] if pyarrow is not None else []) + (['.h5'] if tables is not None else [])
+metadata_key = 'labbuddy' # Name under which the tracking metadata is embedded in the files
+hdf5_key = 'trajectories' # Name of the table in HDF5 files
+categories_suffix = '.categories' # Suffix of the arrays holding the categories of the text columns in NPZ files
+
+
+def write_columnar(data: pd.DataFrame, filepath: str, metadata: dict, file_extension: str = None) -> None:
+    '''Write a table to a binary columnar file, with the tracking metadata embedded in it.
+
+    :param pd.DataFrame data: The table, whose columns keep their types.
+    :param str filepath: Path to the file.
+    :param dict metadata: The metadata, which must be serializable to JSON.
+    :param str file_extension: The extension of the format, one of columnar_file_extensions, defaults to None (extension of the file)
+    :raises ImportError: If the package required by the format is not installed.
+    :raises ValueError: If the extension is not one of a columnar format.
+    '''
+    metadata_json = json.dumps(metadata)
+    if file_extension is None:
+        file_extension = os.path.splitext(filepath)[1]
+
+    if file_extension == '.npz':
+        # Arrays of objects can't be read back without pickle, text columns are stored as categories and their codes
+        arrays = {}
+        for name, column in data.items():
+            if column.dtype == object or isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype('category')
+                arrays[name] = column.cat.codes.to_numpy()
+                arrays[name + categories_suffix] = column.cat.categories.to_numpy().astype(str)
+            else:
+                arrays[name] = column.to_numpy()
+        # np.savez_compressed would append .npz to any other extension, the file is opened beforehand to keep the path as given
+        with open(filepath, 'wb') as f:
+            np.savez_compressed(f, **arrays, **{metadata_key: np.array(metadata_json)})
+
+    elif file_extension in ('.parquet', '.feather'):
+        if pyarrow is None:
+            raise ImportError('The pyarrow package is required to write Parquet and Feather files.')
+        table = pyarrow.Table.from_pandas(data, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), metadata_key.encode(): metadata_json.encode()})
+        if file_extension == '.parquet':
+            pyarrow.parquet.write_table(table, filepath, compression='zstd')
+        else:
+            pyarrow.feather.write_feather(table, filepath, compression='zstd')
+
+    elif file_extension == '.h5':
+        if tables is None:
+            raise ImportError('The tables package is required to write HDF5 files.')
+        with pd.HDFStore(filepath, mode='w', complevel=5, complib='blosc:zstd') as store:
+            store.put(hdf5_key, data, format='table')
+            store.get_storer(hdf5_key).attrs[metadata_key] = metadata_json
+
+    else:
+        raise ValueError(f'Unknown columnar file extension: {file_extension}')
+
+
+def read_columnar(filepath: str) -> tuple[pd.DataFrame, dict]:
+    '''Read a file written by write_columnar, e.g. from an analysis notebook.
+
+    :param str filepath: Path to the file.
+    :raises ImportError: If the package required by the format is not installed.
+    :raises ValueError: If the extension is not one of a columnar format.
+    :return tuple[pd.DataFrame, dict]: The table and the tracking metadata.
+    '''
+    if filepath.endswith('.npz'):
+        with np.load(filepath) as arrays:
+            metadata = json.loads(arrays[metadata_key].item())
+            columns = {}
+            for name in arrays.files:
+                if name == metadata_key or name.endswith(categories_suffix):
+                    continue
+                if name + categories_suffix in arrays.files:
+                    columns[name] = pd.Categorical.from_codes(arrays[name], arrays[name + categories_suffix])
+                else:
+                    columns[name] = arrays[name]
+            data = pd.DataFrame(columns)
+        return data, metadata
+
+    elif filepath.endswith(('.parquet', '.feather')):
+        if pyarrow is None:
+            raise ImportError('The pyarrow package is required to read Parquet and Feather files.')
+        table = pyarrow.parquet.read_table(filepath) if filepath.endswith('.parquet') else pyarrow.feather.read_table(filepath)
+        return table.to_pandas(), json.loads(table.schema.metadata[metadata_key.encode()])
+
+    elif filepath.endswith('.h5'):
+        if tables is None:
+            raise ImportError('The tables package is required to read HDF5 files.')
+        with pd.HDFStore(filepath, mode='r') as store:
+            return store.get(hdf5_key), json.loads(store.get_storer(hdf5_key).attrs[metadata_key])
+
+    raise ValueError(f'Unknown columnar file extension: {filepath}')
@@ -1,9 +1,13 @@
 import os
 import cv2
+import time
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
+from typing import Callable
+from PIL import Image, ImageTk
 
+from . import jobs
 from . import funcs
 from . import enums
 
@@ -22,10 +26,11 @@ class SubMenuOption(tk.Frame):
     # Attribute to be set in the subclass
     display_name = None
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, settings: enums.SettingsEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
         tk.Frame.__init__(self, parent)
         self.color_palette = color_palette
         self.lpack = langage_pack
+        self.settings = settings
         self.config(bg=self.color_palette.BACKGROUND)
 
         self.header_title = header_title
@@ -104,26 +109,95 @@ class FileInputFrame(CustomFrame):
 
 class DeterminateProgressbarFrame(CustomFrame):
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, refresh_rate: float = 10) -> None:
         super().__init__(parent, color_palette)
 
         self.label = tk.Label(self, text='', font=('Arial', 12), bg=self.color_palette.BACKGROUND, anchor='w')
         self.progress_bar = ttk.Progressbar(self, mode='determinate')
         self.label.place(relx=.25, rely=.75, relwidth=.5, relheight=.05)
         self.progress_bar.place(relx=.25, rely=.8, relwidth=.5, relheight=.05)
-        self.image_widget: tk.Label = None
-                                
-    def set_progress(self, progress: int, maximum: int, text: str, image: cv2.typing.MatLike = None) -> None:
-        self.update()
+        self.image_widget = tk.Label(self, bg=self.color_palette.BACKGROUND)
+
+        # The frame is redrawn at most refresh_rate times per second, reusing the same image
+        self.refresh_rate = refresh_rate
+        self._photo_image: ImageTk.PhotoImage = None
+        self._last_refresh = 0.
+
+    def add_job_controls(self, job: jobs.BackgroundJob, cancel_text: str, pause_text: str, resume_text: str) -> None:
+        '''Add buttons to cancel, pause and resume the background job whose progress is shown.
+
+        :param jobs.BackgroundJob job: The job.
+        :param str cancel_text: The text of the cancel button.
+        :param str pause_text: The text of the pause button.
+        :param str resume_text: The text of the pause button while the job is paused.
+        '''
+        button_params = {
+            'master': self,
+            'font': ('', 10),
+            'bg': self.color_palette.POPUP,
+            'cursor': 'hand2',
+            'activebackground': self.color_palette.HEADER,
+            'borderwidth': 1,
+        }
+
+        def on_pause_button_click() -> None:
+            if job.paused:
+                job.resume()
+                self.pause_button.config(text=pause_text, relief=tk.RAISED)
+            else:
+                job.pause()
+                self.pause_button.config(text=resume_text, relief=tk.SUNKEN)
+
+        def on_cancel_button_click() -> None:
+            job.cancel()
+            self.cancel_button.config(state='disabled')
+            self.pause_button.config(state='disabled')
+
+        self.pause_button = tk.Button(text=pause_text, **button_params, command=on_pause_button_click)
+        self.cancel_button = tk.Button(text=cancel_text, **button_params, command=on_cancel_button_click)
+        self.pause_button.place(relx=.25, rely=.875, relwidth=.2, relheight=.05)
+        self.cancel_button.place(relx=.55, rely=.875, relwidth=.2, relheight=.05)
+
+    def set_progress(self, progress: int, maximum: int, text: str, image: cv2.typing.MatLike | Callable[[], cv2.typing.MatLike] = None, show_count: bool = True) -> None:
+        '''Update the progress of the task.
+        This method is cheap to call from a loop: the frame is only redrawn if enough time passed since the last redraw,
+        or if the task is complete. Calls made in between return immediately.
+
+        :param int progress: The current progress.
+        :param int maximum: The progress value when the task is complete.
+        :param str text: The description of the task.
+        :param cv2.typing.MatLike | Callable[[], cv2.typing.MatLike] image: The preview image, or a function returning it so that
+            it is only rendered when the frame is redrawn, defaults to None
+        :param bool show_count: Whether the progress and maximum values are shown after the text, defaults to True
+        '''
+        now = time.perf_counter()
+        if progress < maximum and now - self._last_refresh < 1 / self.refresh_rate:
+            return
+        self._last_refresh = now
+
         if image is not None:
-            self.image_widget = funcs.get_image_widget_from_cv2(self, image, bg=self.color_palette.BACKGROUND, relwidth=.9, relheight=.6, return_as_label=True)
-            self.image_widget.place(relx=.05, rely=.05, relwidth=.9, relheight=.6)
-        elif self.image_widget is not None:
-            self.image_widget.config(state='disabled')
-            self.image_widget = None
-        self.label.config(text=text)
+            self._show_image(image() if callable(image) else image)
+        elif self.image_widget.winfo_ismapped():
+            self.image_widget.place_forget()
+        self.label.config(text=f'{text} {progress}/{maximum}' if show_count else text)
         self.progress_bar.config(maximum=maximum, value=progress)
-        self.progress_bar.update()
+        self.update()
+
+    def _show_image(self, image: cv2.typing.MatLike) -> None:
+        relwidth, relheight = .9, .6
+        width, height = self.winfo_width() * relwidth, self.winfo_height() * relheight
+        scaling_factor = min(width / image.shape[1], height / image.shape[0])
+        size = (max(1, int(image.shape[1] * scaling_factor)), max(1, int(image.shape[0] * scaling_factor)))
+        im = Image.fromarray(cv2.cvtColor(cv2.resize(image, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB))
+
+        # Pasting in the existing image is much cheaper than creating a new one
+        if self._photo_image is None or (self._photo_image.width(), self._photo_image.height()) != size:
+            self._photo_image = ImageTk.PhotoImage(im)
+            self.image_widget.config(image=self._photo_image)
+        else:
+            self._photo_image.paste(im)
+        if not self.image_widget.winfo_ismapped():
+            self.image_widget.place(relx=.05, rely=.05, relwidth=relwidth, relheight=relheight)
 
 
 
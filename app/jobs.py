@@ -0,0 +1,147 @@
+import queue
+import threading
+import tkinter as tk
+from typing import Any, Callable
+
+
+
+class JobCancelled(Exception):
+    '''Raised inside a background job when it has been cancelled.'''
+
+
+
+class BackgroundJob:
+    '''Run a long task in a worker thread, without blocking the Tk main loop.
+
+    The task receives the job as its only argument, and reports its progress through
+    job.set_progress, which takes the same arguments as DeterminateProgressbarFrame.set_progress.
+    Only the latest progress is kept, and it is forwarded to the progressbar from the main loop,
+    which polls the job with after(). The result of the task, or the exception it raised,
+    is posted back through a queue and handed to the callbacks from the main loop as well.
+    Without an on_error callback, the exception is raised again from the main loop.
+
+    Each call to set_progress is also a checkpoint: it blocks while the job is paused,
+    and raises JobCancelled once the job has been cancelled.
+
+    A job whose result is not awaited anymore, e.g. when the user leaves the frame that started it, is abandoned:
+    it is cancelled, its callbacks are dropped, and the resources used by the task are released once it has returned.
+    '''
+
+    def __init__(self, widget: tk.Misc, target: Callable[['BackgroundJob'], Any], on_done: Callable[[Any], None], on_cancelled: Callable[[], None] = None, on_error: Callable[[BaseException], None] = None, progressbar: Any = None, poll_interval: int = 50) -> None:
+        '''
+        :param tk.Misc widget: The widget whose after() method is used to poll the job.
+        :param Callable[[BackgroundJob], Any] target: The task, called with the job as argument.
+        :param Callable[[Any], None] on_done: Called from the main loop with the result of the task.
+        :param Callable[[], None] on_cancelled: Called from the main loop if the job has been cancelled, defaults to None
+        :param Callable[[BaseException], None] on_error: Called from the main loop with the exception raised by the task, defaults to None
+        :param frames.DeterminateProgressbarFrame progressbar: The progressbar showing the progress of the job, defaults to None
+        :param int poll_interval: The time between two polls, in milliseconds, defaults to 50
+        '''
+        self.widget = widget
+        self.target = target
+        self.on_done = on_done
+        self.on_cancelled = on_cancelled
+        self.on_error = on_error
+        self.progressbar = progressbar
+        self.poll_interval = poll_interval
+
+        self._messages: queue.Queue = queue.Queue()
+        self._progress: dict = None
+        self._cancelled = threading.Event()
+        self._running = threading.Event() # Cleared while the job is paused
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._finished = False # Whether the outcome of the task has been handled by the main loop
+        self._abandoned = False
+        self._on_finished: Callable[[Any], None] = None
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def running(self) -> threading.Event:
+        '''Set while the job runs, cleared while it is paused.
+        The threads and processes started by the task wait on it, since only the task itself goes through the checkpoints.
+        '''
+        return self._running
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def start(self) -> None:
+        self._thread.start()
+        self.widget.after(self.poll_interval, self._poll)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        self._running.set() # A paused job must wake up to notice it has been cancelled
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def abandon(self, on_finished: Callable[[Any], None] = None) -> None:
+        '''Cancel the job and drop its callbacks, which would act on a frame that is gone.
+        This method must only be called from the main loop.
+
+        :param Callable[[Any], None] on_finished: Called from the main loop once the task has returned, or right away if it already has,
+            with the result of the task, or None if it was cancelled or failed. The resources the task reads can only be released then, defaults to None
+        '''
+        self._abandoned = True
+        self._on_finished = on_finished
+        self.cancel()
+        if self._finished and on_finished is not None:
+            on_finished(None)
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def checkpoint(self) -> None:
+        '''Block while the job is paused, and raise JobCancelled if it has been cancelled.
+        This method must only be called from the task.
+        '''
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, **kwargs) -> None:
+        '''Report the progress of the task, see DeterminateProgressbarFrame.set_progress for the arguments.
+        This method must only be called from the task.
+        '''
+        self.checkpoint()
+        self._progress = kwargs
+
+    def _run(self) -> None:
+        try:
+            result = self.target(self)
+            self._messages.put(('done', result))
+        except JobCancelled:
+            self._messages.put(('cancelled', None))
+        except BaseException as e:
+            self._messages.put(('error', e))
+
+    def _poll(self) -> None:
+        progress, self._progress = self._progress, None
+        if progress is not None and self.progressbar is not None and not self._abandoned:
+            self.progressbar.set_progress(**progress)
+
+        try:
+            kind, value = self._messages.get_nowait()
+        except queue.Empty:
+            self.widget.after(self.poll_interval, self._poll)
+            return
+
+        self._finished = True
+        if self._abandoned:
+            if self._on_finished is not None:
+                self._on_finished(value if kind == 'done' else None)
+        elif kind == 'done':
+            self.on_done(value)
+        elif kind == 'cancelled':
+            if self.on_cancelled is not None:
+                self.on_cancelled()
+        elif self.on_error is not None:
+            self.on_error(value)
+        else:
+            raise value
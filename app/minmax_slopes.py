@@ -1,23 +1,104 @@
 import re
 import pandas as pd
 import tkinter as tk
+from tkinter import messagebox
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.collections as collections
 import matplotlib.backends.backend_tkagg as tkagg
 
+from . import jobs
 from . import funcs
 from . import enums
 from . import frames
 
 
 
+def get_minmax_slopes(x_values: list[float], y_values: list[float], dx_values: list[float], dy_values: list[float], text: str = '', progressbar: frames.DeterminateProgressbarFrame | jobs.BackgroundJob = None) -> tuple[float]:
+    '''Search the minimum and maximum slopes of the lines going through the uncertainty boxes of every point
+
+    :param list[float] x_values: The X values of the points
+    :param list[float] y_values: The Y values of the points
+    :param list[float] dx_values: The uncertainties on the X values
+    :param list[float] dy_values: The uncertainties on the Y values
+    :param str text: The text shown with the progressbar, defaults to ''
+    :param frames.DeterminateProgressbarFrame | jobs.BackgroundJob progressbar: The progressbar to be updated along the process, defaults to None
+    :return tuple[float]: The minimum slope, its y-intercept, the maximum slope and its y-intercept, or four None values if no line was found
+    '''
+    # Compute the positions of all points at the corner of every uncertainty box
+    points = []
+    for i in range(len(x_values)):
+        xi, yi = x_values[i], y_values[i]
+        dxi, dyi = dx_values[i], dy_values[i]
+        points.extend([
+            (xi - dxi, yi - dyi), # bottom-left point
+            (xi - dxi, yi + dyi), # top-left point
+            (xi + dxi, yi - dyi), # bottom-right point
+            (xi + dxi, yi + dyi)  # top-right point
+        ])
+
+    slope_min, slope_max = float('inf'), -float('inf')
+    y_intercept_min, y_intercept_max = 0, 0
+    # Check every slope between every possible pair of points computed above
+    for i in range(len(points)):
+        for j in range(i+1, len(points)):
+            x1, y1, x2, y2 = *points[i], *points[j]
+
+            # Skip points having the same x position to avoid ZeroDivisionError and infinite slopes
+            if x1 == x2: continue
+
+            # Compute the slope (m) and y-intercept (c) of the line between the two points
+            m = (y2 - y1) / (x2 - x1)
+            c = y1 - m * x1 # We use y=mx+c
+
+            # Check if the line goes through every uncertainty box
+            if (m < slope_min or m > slope_max) and is_slope_valid(m, c, x_values, y_values, dx_values, dy_values):
+                if m < slope_min: slope_min, y_intercept_min = m, c
+                if m > slope_max: slope_max, y_intercept_max = m, c
+
+        if progressbar is not None:
+            progressbar.set_progress(progress=i+1, maximum=len(points), text=text)
+
+    if slope_min != float('inf') and slope_max != -float('inf'):
+        return slope_min, y_intercept_min, slope_max, y_intercept_max
+    return None, None, None, None
+
+
+def is_slope_valid(slope: float, y_intercept: float, x_values: list[float], y_values: list[float], dx_values: list[float], dy_values: list[float]) -> bool:
+    '''Checks if the provided line crosses all uncertainty boxes of all points
+
+    :param float slope: The slope of the line
+    :param float y_intercept: The y-intercept of the line
+    :param list[float] x_values: The X values of the points
+    :param list[float] y_values: The Y values of the points
+    :param list[float] dx_values: The uncertainties on the X values
+    :param list[float] dy_values: The uncertainties on the Y values
+    :return bool: True if the line crosses all uncertainty boxes, False otherwise
+    '''
+    valid = True
+    i = 0
+    while valid and i < len(x_values):
+
+        if  not funcs.collision_line_rectangle(
+            m= slope,
+            c= y_intercept,
+            x= x_values[i] - dx_values[i],
+            y= y_values[i] - dx_values[i],
+            w= 2 * dx_values[i],
+            h= 2 * dy_values[i]
+        ):
+            valid = False
+        i += 1
+    return valid
+
+
+
 class MinMaxSlopes(frames.SubMenuOption):
 
     supported_filetypes = [('Spreadsheet files', '*.csv *.ods *.xlsx'),]
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
-        super().__init__(parent, color_palette, langage_pack, header_title, header_subtitle)
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, settings: enums.SettingsEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
+        super().__init__(parent, color_palette, langage_pack, settings, header_title, header_subtitle)
         self.color_palette = color_palette
         self.display_name = self.lpack.mms.DISPLAY_NAME
 
@@ -27,9 +108,13 @@ class MinMaxSlopes(frames.SubMenuOption):
         self.excel_file: pd.ExcelFile = None
         self.x_values: list[float]
         self.y_values: list[float]
+        self.job: jobs.BackgroundJob = None # The last job started, whose callbacks must not act on the frames of a new load
 
     def load(self) -> None:
         self.tkraise()
+        if self.job is not None:
+            self.job.abandon()
+            self.job = None
 
         self.header_title.config(text=self.lpack.mms.TITLE)
         self.header_subtitle.config(text='')
@@ -76,11 +161,35 @@ class MinMaxSlopes(frames.SubMenuOption):
         elif dy_type == type_relative: self.dy_values = [self.data_selection_frame.y_uncertainties * val for val in self.y_values]
         elif dy_type == type_column: self.dy_values = self.data_selection_frame.df[self.data_selection_frame.y_uncertainties_column.get()].tolist()
 
-        self.plot_frame = PlotFrame(self, self.color_palette, self.lpack, self.x_values, self.y_values, self.x_column_name, self.y_column_name, self.dx_values, self.dy_values)
+        # Search the slopes in the background
+        # The data selection frame is kept below the progressbar, to get back to it if the job is cancelled or fails
+        self.slopes_progress_frame = frames.DeterminateProgressbarFrame(self, self.color_palette)
+        self.slopes_progress_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.slopes_progress_frame.tkraise()
+
+        job = jobs.BackgroundJob(
+            self,
+            target=lambda job: get_minmax_slopes(self.x_values, self.y_values, self.dx_values, self.dy_values, self.lpack.mms.COMPUTING_SLOPES, progressbar=job),
+            on_done=self._on_slopes_computed,
+            on_cancelled=self.slopes_progress_frame.destroy,
+            on_error=self._on_slopes_error,
+            progressbar=self.slopes_progress_frame
+        )
+        self.slopes_progress_frame.add_job_controls(job, self.lpack.jobs.CANCEL, self.lpack.jobs.PAUSE, self.lpack.jobs.RESUME)
+        self.job = job
+        job.start()
+
+    def _on_slopes_computed(self, slopes: tuple[float]) -> None:
+        self.plot_frame = PlotFrame(self, self.color_palette, self.lpack, self.x_values, self.y_values, self.x_column_name, self.y_column_name, self.dx_values, self.dy_values, slopes)
         self.header_title.config(text=' - '.join([self.lpack.mms.TITLE, self.lpack.mms.plot_frame.TITLE]))
         self.plot_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
 
+        self.slopes_progress_frame.destroy()
         self.data_selection_frame.destroy()
+
+    def _on_slopes_error(self, error: BaseException) -> None:
+        self.slopes_progress_frame.destroy()
+        messagebox.showerror(self.lpack.jobs.ERROR, f'{type(error).__name__}: {error}', parent=self)
   
     def _load_spreadsheet(self, filepath: str) -> None:
         self.filepath = filepath
@@ -318,7 +427,7 @@ class DataSelectionFrame(frames.CustomFrame):
 
 class PlotFrame(frames.CustomFrame):
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, x_values: list[float], y_values: list[float], x_name: str, y_name: str, dx_values: list[float], dy_values: list[float]) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, x_values: list[float], y_values: list[float], x_name: str, y_name: str, dx_values: list[float], dy_values: list[float], slopes: tuple[float]) -> None:
         super().__init__(parent, color_palette)
         self.lpack = language_pack
 
@@ -326,10 +435,11 @@ class PlotFrame(frames.CustomFrame):
         self.x_name, self.y_name = x_name, y_name
         self.dx_values, self.dy_values = dx_values, dy_values
 
-        self.min_slope: float = None
-        self.max_slope: float = None
-        self.min_y_intercept: float = None
-        self.max_y_intercept: float = None
+        # As returned by get_minmax_slopes
+        self.min_slope, self.min_y_intercept, self.max_slope, self.max_y_intercept = slopes
+        if self.min_slope is not None:
+            self.avg_slope = (self.max_slope + self.min_slope) / 2
+            self.slope_uncertainty = (self.max_slope - self.min_slope) / 2
 
         self.btns_frame = tk.Frame(self, bg=self.color_palette.POPUP)
         self.btns_frame.place(relx=0, rely=.8, relwidth=1, relheight=.2)
@@ -354,7 +464,6 @@ class PlotFrame(frames.CustomFrame):
         fig.patch.set_facecolor(self.color_palette.BACKGROUND)
         ax.plot(self.x_values, self.y_values, 'k+')
         self._add_uncertainty_boxes(ax)
-        self._get_slopes()
         self._add_line(ax, self.min_slope, self.min_y_intercept)
         self._add_line(ax, self.max_slope, self.max_y_intercept)
         
@@ -380,68 +489,6 @@ class PlotFrame(frames.CustomFrame):
         y1, y2 = slope * x1 + y_intercept, slope * x2 + y_intercept
         axis.plot([x1, x2], [y1, y2])
 
-    def _get_slopes(self) -> None:
-        # Compute the positions of all points at the corner of every uncertainty box
-        points = []
-        for i in range(len(self.x_values)):
-            xi, yi = self.x_values[i], self.y_values[i]
-            dxi, dyi = self.dx_values[i], self.dy_values[i]
-            points.extend([
-                (xi - dxi, yi - dyi), # bottom-left point
-                (xi - dxi, yi + dyi), # top-left point
-                (xi + dxi, yi - dyi), # bottom-right point
-                (xi + dxi, yi + dyi)  # top-right point
-            ])
-
-        slope_min, slope_max = float('inf'), -float('inf')
-        y_intercept_min, y_intercept_max = 0, 0
-        # Check every slope between every possible pair of points computed above
-        for i in range(len(points)):
-            for j in range(i+1, len(points)):
-                x1, y1, x2, y2 = *points[i], *points[j]
-
-                # Skip points having the same x position to avoid ZeroDivisionError and infinite slopes
-                if x1 == x2: continue
-
-                # Compute the slope (m) and y-intercept (c) of the line between the two points
-                m = (y2 - y1) / (x2 - x1)
-                c = y1 - m * x1 # We use y=mx+c
-                
-                # Check if the line goes through every uncertainty box
-                if (m < slope_min or m > slope_max) and self._is_slope_valid(m, c):
-                    if m < slope_min: slope_min, y_intercept_min = m, c
-                    if m > slope_max: slope_max, y_intercept_max = m, c
-
-        if slope_min != float('inf') and slope_max != -float('inf'):
-            self.min_slope, self.max_slope = slope_min, slope_max
-            self.min_y_intercept, self.max_y_intercept = y_intercept_min, y_intercept_max
-
-            self.avg_slope = (self.max_slope + self.min_slope) / 2
-            self.slope_uncertainty = (self.max_slope - self.min_slope) / 2
-
-    def _is_slope_valid(self, slope: float, y_intercept: float) -> bool:
-        '''Checks if the provided line crosses all uncertainty boxes of all points
-
-        :param float slope: The slope of the line
-        :param float y_intercept: The y-intercept of the line
-        :return bool: True if the line crosses all uncertainty boxes, False otherwise
-        '''
-        valid = True
-        i = 0
-        while valid and i < len(self.x_values):
-
-            if  not funcs.collision_line_rectangle(
-                m= slope, 
-                c= y_intercept,
-                x= self.x_values[i] - self.dx_values[i],
-                y= self.y_values[i] - self.dx_values[i],
-                w= 2 * self.dx_values[i],
-                h= 2 * self.dy_values[i]
-            ):
-                valid = False
-            i += 1
-        return valid
-
     def _display_slope_equation(self, parent: tk.Frame, slope: float, y_intercept: float, text: str) -> None:
         frame = tk.Frame(parent, bg=self.color_palette.POPUP)
         label_params = {
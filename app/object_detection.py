@@ -1,13 +1,26 @@
+import os
 import cv2
 import random
 import imutils
+import functools
+import numpy as np
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog
+from tkinter import messagebox
+from typing import Any
 
 from . import funcs
 from . import enums
 from . import frames
+from . import jobs
+from . import cache
+from . import video
+from . import camera
+from . import export
+from . import detection
+from .trajectory import Trajectory
+from .calibration import Calibration
 
 
 
@@ -15,21 +28,45 @@ class ObjectDetection(frames.SubMenuOption):
 
     supported_filetypes = [('Video files', '*.mp4 *.avi'), ]
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
-        super().__init__(parent, color_palette, langage_pack, header_title, header_subtitle)
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, langage_pack: enums.LanguagePackEnum, settings: enums.SettingsEnum, header_title: tk.Frame, header_subtitle: tk.Frame) -> None:
+        super().__init__(parent, color_palette, langage_pack, settings, header_title, header_subtitle)
         self.color_palette = color_palette
         self.display_name = self.lpack.od.DISPLAY_NAME
         
         self.video_path: str = None
         self.video_fps: float = None
-        self.video_frames: list[cv2.typing.MatLike] = None
+        self.video_start: int = 0 # Window of the video frames to decode, as frame indexes
+        self.video_stop: int = None
+        self.video_frames: video.FrameSource = None
+        self.camera_profile: camera.CameraProfile = None
+        self.job: jobs.BackgroundJob = None # The last job started, which may still read the frames
 
     def load(self) -> None:
         self.tkraise()
 
+        # The threads of a running job may still read the frames, they are only released once it has returned
+        video_frames, self.video_frames = self.video_frames, None
+        def release(result: Any) -> None:
+            for frames_source in (video_frames, result):
+                if isinstance(frames_source, video.FrameSource):
+                    frames_source.release()
+        if self.job is not None:
+            self.job.abandon(release)
+            self.job = None
+        else:
+            release(None)
+
         self.header_title.config(text=self.lpack.od.TITLE)
         self.header_subtitle.config(text='')
 
+        self.camera_profile = None
+        if self.settings.CAMERA_PROFILE:
+            self.camera_profile = camera.CameraProfileStore(self.settings.CAMERA_PROFILE_DIRECTORY).load(self.settings.CAMERA_PROFILE)
+            if self.camera_profile is None:
+                # The camera is calibrated once, its profile is reused afterwards
+                self._ask_checkerboard_video()
+                return
+
         self.file_input_frame = frames.FileInputFrame(
             self,
             self.color_palette,
@@ -42,18 +79,118 @@ class ObjectDetection(frames.SubMenuOption):
         self.file_input_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
         self.file_input_frame.bind('<<FileSelected>>', self._on_file_selected)
 
+    def _ask_checkerboard_video(self, not_found: bool = False) -> None:
+        lpack = self.lpack.od.camera_calibration_frame
+        self.checkerboard_input_frame = frames.FileInputFrame(
+            self,
+            self.color_palette,
+            title=lpack.SELECT_FILE,
+            text=lpack.NOT_FOUND if not_found else lpack.TEXT.replace('{{?}}', self.settings.CAMERA_PROFILE),
+            button_text=lpack.BUTTON_TEXT,
+            filetypes=self.supported_filetypes
+        )
+        self.header_title.config(text=' - '.join([self.lpack.od.TITLE, lpack.TITLE]))
+        self.checkerboard_input_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.checkerboard_input_frame.bind('<<FileSelected>>', self._on_checkerboard_video_selected)
+
+    def _on_checkerboard_video_selected(self, event: tk.Event) -> None:
+        checkerboard_video_path = self.checkerboard_input_frame.filepath
+        self.checkerboard_input_frame.destroy()
+
+        # Calibrate the camera in the background
+        self.camera_calibration_progress_frame = frames.DeterminateProgressbarFrame(self, self.color_palette)
+        self.camera_calibration_progress_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.camera_calibration_progress_frame.tkraise()
+
+        def calibrate(job: jobs.BackgroundJob) -> camera.CameraProfile:
+            job.set_progress(progress=0, maximum=1, text=self.lpack.od.CALIBRATING_CAMERA, show_count=False)
+            try:
+                return camera.CameraProfile.from_checkerboard_video(
+                    checkerboard_video_path,
+                    pattern_size=(self.settings.CHECKERBOARD_COLUMNS, self.settings.CHECKERBOARD_ROWS),
+                    on_progress=lambda searched_count, frame_count: job.set_progress(progress=searched_count, maximum=frame_count, text=self.lpack.od.CALIBRATING_CAMERA)
+                )
+            except ValueError:
+                return None # The checkerboard was not found on enough frames
+
+        def on_done(profile: camera.CameraProfile) -> None:
+            self.camera_calibration_progress_frame.destroy()
+            if profile is None:
+                self._ask_checkerboard_video(not_found=True)
+                return
+            camera.CameraProfileStore(self.settings.CAMERA_PROFILE_DIRECTORY).save(self.settings.CAMERA_PROFILE, profile)
+            self.load()
+
+        def on_cancelled() -> None:
+            self.camera_calibration_progress_frame.destroy()
+            self._ask_checkerboard_video()
+
+        def on_error(error: BaseException) -> None:
+            on_cancelled()
+            self._show_error(error)
+
+        job = jobs.BackgroundJob(
+            self,
+            target=calibrate,
+            on_done=on_done,
+            on_cancelled=on_cancelled,
+            on_error=on_error,
+            progressbar=self.camera_calibration_progress_frame
+        )
+        self.camera_calibration_progress_frame.add_job_controls(job, self.lpack.jobs.CANCEL, self.lpack.jobs.PAUSE, self.lpack.jobs.RESUME)
+        self.job = job
+        job.start()
+
     def _on_file_selected(self, event: tk.Event) -> None:
         self.video_path = self.file_input_frame.filepath
 
-        # Load the video
+        # Ask the user to select the part of the video to process
+        self.time_window_selector_frame = TimeWindowSelectorFrame(self, self.color_palette, self.lpack, self.video_path)
+        self.header_title.config(text=' - '.join([self.lpack.od.TITLE, self.lpack.od.time_window_selector_frame.TITLE]))
+        self.header_subtitle.config(text=self._format_path_for_display(self.video_path))
+        self.time_window_selector_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.time_window_selector_frame.bind('<<TimeWindowSelected>>', self._on_time_window_selected)
+        self.time_window_selector_frame.update_images()
+
+        self.file_input_frame.destroy()
+
+    def _on_time_window_selected(self, event: tk.Event) -> None:
+        self.video_start = self.time_window_selector_frame.start_frame
+        self.video_stop = self.time_window_selector_frame.stop_frame
+
+        # Load the video in the background, only the frames of the selected window are decoded
         self.video_load_progress_frame = frames.DeterminateProgressbarFrame(self, self.color_palette)
         self.video_load_progress_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
-        self.file_input_frame.destroy()
+        self.video_load_progress_frame.tkraise()
+        self.time_window_selector_frame.destroy()
+
+        def on_cancelled() -> None:
+            self.video_load_progress_frame.destroy()
+            self.load()
+
+        def on_error(error: BaseException) -> None:
+            on_cancelled()
+            self._show_error(error)
+
+        job = jobs.BackgroundJob(
+            self,
+            target=lambda job: self._load_video(self.video_path, self.video_start, self.video_stop, progressbar=job),
+            on_done=self._on_video_loaded,
+            on_cancelled=on_cancelled,
+            on_error=on_error,
+            progressbar=self.video_load_progress_frame
+        )
+        self.video_load_progress_frame.add_job_controls(job, self.lpack.jobs.CANCEL, self.lpack.jobs.PAUSE, self.lpack.jobs.RESUME)
+        self.job = job
+        job.start()
+
+    def _on_video_loaded(self, video_frames: video.FrameSource) -> None:
+        self.video_frames = video_frames
+        self.video_fps = video_frames.fps
 
-        self._load_video(self.video_path)
 
         # Ask the user to select a scale
-        self.scale_selector_frame = ScaleSelectorFrame(self, self.color_palette, self.lpack, self.video_frames)
+        self.scale_selector_frame = ScaleSelectorFrame(self, self.color_palette, self.lpack, self.video_frames, self.camera_profile)
         self.scale_selector_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
         self.scale_selector_frame.bind('<<ScaleSelected>>', self._on_scale_selected)
         self.header_title.config(text=' - '.join([self.lpack.od.TITLE, self.lpack.od.scale_selector_frame.TITLE]))
@@ -68,9 +205,12 @@ class ObjectDetection(frames.SubMenuOption):
         self.scale_distance = self.scale_selector_frame.distance
         self.scale_distance_unit_power = self.scale_selector_frame.distance_unit_power
         self.scale_distance_unit = self.scale_selector_frame.distance_unit_str
+        # The corners of a rectangle of the plane of motion, of size scale_distance x scale_height, or None if the scale is given by two points
+        self.scale_corners = self.scale_selector_frame.corners if self.scale_selector_frame.plane_mode else None
+        self.scale_height = self.scale_selector_frame.height
 
         # Ask the user to select an origin
-        self.origin_selector_frame = OriginSelectorFrame(self, self.color_palette, self.lpack, self.video_frames)
+        self.origin_selector_frame = OriginSelectorFrame(self, self.color_palette, self.lpack, self.video_frames, self.camera_profile)
         self.header_title.config(text=' - '.join([self.lpack.od.TITLE, self.lpack.od.origin_selector_frame.TITLE]))
         self.origin_selector_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
         self.origin_selector_frame.bind('<<OriginSelected>>', self._on_origin_selected)
@@ -95,65 +235,151 @@ class ObjectDetection(frames.SubMenuOption):
         self.origin_selector_frame.destroy()
 
     def _on_color_bounds_selected(self, event: tk.Event) -> None:
-        lower_color_bound = (
-            self.color_bounds_selector_frame.lower_h_slider.get(),
-            self.color_bounds_selector_frame.lower_s_slider.get(),
-            self.color_bounds_selector_frame.lower_v_slider.get()
-        )
-        upper_color_bound = (
-            self.color_bounds_selector_frame.upper_h_slider.get(),
-            self.color_bounds_selector_frame.upper_s_slider.get(),
-            self.color_bounds_selector_frame.upper_v_slider.get()
-        )
+        # The current bounds are the ones of the last object
+        color_bounds = self.color_bounds_selector_frame.color_bounds + [self.color_bounds_selector_frame.get_color_bounds()]
+        self.color_bounds = color_bounds
+        self.object_names = [self.lpack.od.OBJECT_NAME.replace('{{?}}', str(i + 1)) for i in range(len(color_bounds))]
 
-        # Compute the object's positions
+        # Compute the object's positions in the background
+        # The color bounds selector is kept below the progressbar, to get back to it if the job is cancelled or fails
         self.video_mask_progress_frame = frames.DeterminateProgressbarFrame(self, self.color_palette)
         self.video_mask_progress_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
-        self.color_bounds_selector_frame.destroy()
+        self.video_mask_progress_frame.tkraise()
 
-        self.object_circles, self.object_centroids = self._compute_object_positions(
-            video_frames=self.video_frames, 
-            lower_bound=lower_color_bound,
-            upper_bound=upper_color_bound,
-            progressbar=self.video_mask_progress_frame
-        )
+        def track(job: jobs.BackgroundJob) -> None:
+            self.object_trajectories, self.frame_statuses = self._compute_object_positions(
+                video_frames=self.video_frames,
+                color_bounds=color_bounds,
+                progressbar=job
+            )
+
+            job.set_progress(progress=0, maximum=1, text=self.lpack.od.CONVERTING_COORDINATES, show_count=False)
+            if self.camera_profile is not None:
+                # The scale and origin were selected on undistorted frames, the positions are moved onto them
+                size = self.video_frames.full_width, self.video_frames.full_height
+                self.object_trajectories = [
+                    trajectory.with_positions(*self.camera_profile.undistort_points(trajectory.x, trajectory.y, size))
+                    for trajectory in self.object_trajectories
+                ]
+            self.origin_point = self._get_origin_point()
+            if self.scale_corners is not None:
+                calibration = Calibration.from_plane(
+                    corners=self.scale_corners,
+                    width=self.scale_distance,
+                    height=self.scale_height,
+                    origin_point=self.origin_point,
+                    rotation=self.settings.AXIS_ROTATION,
+                    flip_x=self.settings.FLIP_X_AXIS
+                )
+            else:
+                calibration = Calibration.from_scale(
+                    scale_point_1=self.scale_point_1,
+                    scale_point_2=self.scale_point_2,
+                    scale_distance=self.scale_distance,
+                    origin_point=self.origin_point,
+                    rotation=self.settings.AXIS_ROTATION,
+                    flip_x=self.settings.FLIP_X_AXIS
+                )
+            self.object_real_trajectories = [self._image_to_real_positions(trajectory, calibration) for trajectory in self.object_trajectories]
+
+        def on_error(error: BaseException) -> None:
+            self.video_mask_progress_frame.destroy()
+            self._show_error(error)
 
-        self.object_real_positions = self._image_to_real_positions(
-            image_positions=self.object_centroids,
-            scale_point_1=self.scale_point_1,
-            scale_point_2=self.scale_point_2,
-            scale_distance=self.scale_distance,
-            origin_point=self._get_origin_point(),
+        job = jobs.BackgroundJob(
+            self,
+            target=track,
+            on_done=self._on_object_positions_computed,
+            on_cancelled=self.video_mask_progress_frame.destroy,
+            on_error=on_error,
             progressbar=self.video_mask_progress_frame
         )
+        self.video_mask_progress_frame.add_job_controls(job, self.lpack.jobs.CANCEL, self.lpack.jobs.PAUSE, self.lpack.jobs.RESUME)
+        self.job = job
+        job.start()
+
+    def _on_object_positions_computed(self, result: None) -> None:
+        self.color_bounds_selector_frame.destroy()
 
         # Show the save options
-        self.save_frame = SaveFrame(self, self.color_palette, self.lpack, self.object_real_positions, self.scale_distance_unit.get(), 1/self.video_fps)
+        self.save_frame = SaveFrame(self, self.color_palette, self.lpack, self.object_real_trajectories, self.object_names, self.frame_statuses, self.scale_distance_unit.get(), self._get_tracking_metadata())
         self.header_title.config(text=' - '.join([self.lpack.od.TITLE, self.lpack.od.save_frame.TITLE]))
         self.save_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
 
         self.video_mask_progress_frame.destroy()
 
-    def _load_video(self, video_path: str) -> None:
-        '''Load a video from the given path.
+    def _get_tracking_metadata(self) -> dict:
+        '''Return what the positions were computed from, to be embedded in the exported files.
+
+        :return dict: The metadata, serializable to JSON, with pixel coordinates at the full resolution of the video.
+        '''
+        def point(p: tuple[float, float]) -> list[float]:
+            return None if p is None else [float(p[0]), float(p[1])]
+
+        if self.scale_corners is not None:
+            scale = {'corners': [point(corner) for corner in self.scale_corners], 'width': self.scale_distance, 'height': self.scale_height}
+        else:
+            scale = {'points': [point(self.scale_point_1), point(self.scale_point_2)], 'distance': self.scale_distance}
+        return {
+            'video': os.path.basename(self.video_path),
+            'fps': self.video_fps,
+            'first_frame': self.video_frames.first_frame,
+            'frame_size': [self.video_frames.full_width, self.video_frames.full_height],
+            'unit': self.scale_distance_unit.get(),
+            'scale': scale,
+            'origin': point(self.origin_point),
+            'axis_rotation': self.settings.AXIS_ROTATION,
+            'flip_x_axis': self.settings.FLIP_X_AXIS,
+            'camera_profile': self.settings.CAMERA_PROFILE or None,
+            'objects': [
+                {'name': name, 'lower_hsv': [int(v) for v in lower_bound], 'upper_hsv': [int(v) for v in upper_bound]}
+                for name, (lower_bound, upper_bound) in zip(self.object_names, self.color_bounds)
+            ],
+        }
+
+    def _load_video(self, video_path: str, start: int = 0, stop: int = None, progressbar: frames.DeterminateProgressbarFrame | jobs.BackgroundJob = None) -> video.FrameSource:
+        '''Open a video from the given path.
+        Depending on the settings, frames are either decoded on demand by the frame source,
+        or all decoded upfront at the processing resolution into a frame store, possibly by
+        several processes working on separate segments of the video, or into a compressed frame store. Stored frames can be
+        cached on disk, in which case re-opening the same video only memory-maps them.
+        Only the frames of the given window are decoded, seeking to its first frame.
 
         :param str video_path: Path to the video file.
-        :return np.array[cv2.typing.MatLike]: Array of video frames.
+        :param int start: Index of the first frame to decode, defaults to 0
+        :param int stop: Index after the last frame to decode, defaults to None (end of the video)
+        :param frames.DeterminateProgressbarFrame | jobs.BackgroundJob progressbar: The progressbar to be updated along the process, defaults to None
+        :return video.FrameSource: The frames of the video.
         '''
-        self.video_load_progress_frame.tkraise()
+        def on_progress(decoded_count: int, frame_count: int) -> None:
+            if progressbar is not None:
+                progressbar.set_progress(progress=decoded_count, maximum=frame_count, text=self.lpack.od.LOADING_FRAMES)
+
+        if progressbar is not None:
+            progressbar.set_progress(progress=0, maximum=1, text=self.lpack.od.LOADING_FRAMES, show_count=False)
+
+        # Stored frames are decoded at the processing resolution, full resolution frames are decoded on demand
+        width = self.settings.PROCESSING_WIDTH
+        frame_cache = None
+        if self.settings.FRAME_CACHE and self.settings.DECODE_MODE in ('store', 'segmented'):
+            frame_cache = cache.FrameCache(self.settings.CACHE_DIRECTORY, self.settings.CACHE_SIZE_LIMIT * 2**20)
+            video_frames = frame_cache.load(video_path, width, start, stop)
+            if video_frames is not None:
+                return video_frames
+
+        if self.settings.DECODE_MODE == 'segmented':
+            running = progressbar.running if isinstance(progressbar, jobs.BackgroundJob) else None
+            video_frames = video.decode_video_segments(video_path, self.settings.DECODE_WORKERS or None, width, on_progress, start=start, stop=stop, running=running)
+        elif self.settings.DECODE_MODE == 'store':
+            video_frames = video.decode_video(video_path, width, on_progress, start, stop)
+        elif self.settings.DECODE_MODE == 'compressed':
+            video_frames = video.decode_video_compressed(video_path, width, self.settings.FRAME_COMPRESSION, self.settings.DECODE_WORKERS or None, on_progress, start, stop)
+        else:
+            video_frames = video.VideoFrameSource(video_path, start=start, stop=stop)
 
-        video_capture = cv2.VideoCapture(video_path)
-        self.video_fps = video_capture.get(cv2.CAP_PROP_FPS)
-        frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.video_frames = []
-        while video_capture.isOpened():
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-            self.video_frames.append(frame)
-            text = self.lpack.od.LOADING_FRAMES + f' {len(self.video_frames)}/{frame_count}'
-            self.video_load_progress_frame.set_progress(progress=len(self.video_frames), maximum=frame_count, text=text)
-        video_capture.release()
+        if frame_cache is not None:
+            video_frames = frame_cache.save(video_frames, width, stop)
+        return video_frames
 
     def _format_path_for_display(self, path: str, max_length: int = 80) -> str:
         '''Format the file path for display.
@@ -175,123 +401,173 @@ class ObjectDetection(frames.SubMenuOption):
             res = '.../' + res[:-1]
         return res
 
-    def _compute_object_positions(self, video_frames: list[cv2.typing.MatLike], lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, progressbar: frames.DeterminateProgressbarFrame = None) -> tuple[list[tuple[int]]]:
-        '''Apply a color mask to the video frames and returns the obtained circles and centroids positions
+    def _show_error(self, error: BaseException) -> None:
+        '''Show the exception raised by a background job in a message box.
+
+        :param BaseException error: The exception.
+        '''
+        messagebox.showerror(self.lpack.jobs.ERROR, f'{type(error).__name__}: {error}', parent=self)
+
+    def _compute_object_positions(self, video_frames: video.FrameSource, color_bounds: list[tuple[tuple[int], tuple[int]]], object_radius_threshold: int = 2, progressbar: frames.DeterminateProgressbarFrame | jobs.BackgroundJob = None) -> tuple[list[Trajectory], np.ndarray]:
+        '''Apply color masks to the video frames and returns the obtained circles and centroids positions of each object.
+        All the objects are tracked in a single pass, sharing the work done on each frame before applying the masks.
         
-        :param list[cv2.typing.MatLike] video_frames: List of video frames.
-        :param tuple[int] lower_bound: Lower HSV bound of the color range.
-        :param tuple[int] upper_bound: Upper HSV bound of the color range.
+        :param video.FrameSource video_frames: Source of the video frames.
+        :param list[tuple[tuple[int], tuple[int]]] color_bounds: The lower and upper HSV bounds of the color range of each object.
         :param int object_radius_threshold: The threshold radius below which a detected circle is not taken into account, defaults to 2
-        :param frames.DeterminateProgressbarFrame progressbar: The progressbar to be updated along the process, defaults to None
-        :return tuple[list[tuple[int]]]: A tuple containing two elements,
-            - A list[tuple[int, int, int]] of the detected circles, in format (x, y, radius) or None
-            - A list[tuple[int, int]] of the detected centroids, in format (x, y) or None
+        :param frames.DeterminateProgressbarFrame | jobs.BackgroundJob progressbar: The progressbar to be updated along the process, defaults to None
+        :return tuple[list[Trajectory], np.ndarray]: A tuple containing two elements,
+            - The trajectory of each object, in pixels at the full resolution, all over the same frames of the whole video, so that times line up with it
+            - The status of each frame, see the detection.STATUS_* constants
         '''
-        self.video_mask_progress_frame.tkraise()
-
-        object_circles = [] # List of circles representing detected objects, in format (x, y, radius)
-        object_centroids = [] # List of centroids of the detected objects, in format (x, y)
-        frame_count = len(video_frames)
-        for i, frame in enumerate(video_frames):
-            # resize, blur and convert the image to HSV
-            hsv = cv2.cvtColor(
-                cv2.GaussianBlur(imutils.resize(frame, width=600), (11, 11), 0), 
-                cv2.COLOR_BGR2HSV
+        # Positions are given at the full resolution, like the scale and origin points
+        output_scale = video_frames.full_width / self.settings.PROCESSING_WIDTH
+        workers = self.settings.DETECTION_WORKERS or None
+        batch_size = None
+        if self.settings.DETECTION_REGION == 'roi':
+            detect = detection.MultiObjectTracker([
+                detection.RoiTracker(
+                    lower_bound=lower_bound,
+                    upper_bound=upper_bound,
+                    object_radius_threshold=object_radius_threshold,
+                    width=self.settings.PROCESSING_WIDTH,
+                    output_scale=output_scale,
+                    prediction=self.settings.ROI_PREDICTION,
+                    detector=self.settings.DETECTOR
+                )
+                for lower_bound, upper_bound in color_bounds
+            ])
+        elif self.settings.DETECTION_REGION == 'flow':
+            detect = detection.MultiObjectTracker([
+                detection.FlowTracker(
+                    lower_bound=lower_bound,
+                    upper_bound=upper_bound,
+                    object_radius_threshold=object_radius_threshold,
+                    width=self.settings.PROCESSING_WIDTH,
+                    output_scale=output_scale,
+                    keyframe_interval=self.settings.FLOW_KEYFRAME_INTERVAL,
+                    min_confidence=self.settings.FLOW_MIN_CONFIDENCE,
+                    detector=self.settings.DETECTOR
+                )
+                for lower_bound, upper_bound in color_bounds
+            ])
+        elif self.settings.DETECTION_REGION == 'pyramid':
+            detect = functools.partial(
+                detection.detect_colored_objects_pyramid,
+                color_bounds=color_bounds,
+                object_radius_threshold=object_radius_threshold,
+                width=self.settings.PROCESSING_WIDTH,
+                output_scale=output_scale,
+                detector=self.settings.DETECTOR,
+                coarse_width=self.settings.PYRAMID_WIDTH
             )
-            # Apply a color mask and remove any small blobs left in the mask
-            mask = cv2.dilate(
-                cv2.erode(
-                    cv2.inRange(hsv, lower_bound, upper_bound),
-                    None, iterations=2
-                ),
-                None, iterations=2
+        else:
+            batch_size = self.settings.DETECTION_BATCH_SIZE or None
+            detect = functools.partial(
+                detection.detect_objects if batch_size else detection.detect_colored_objects,
+                color_bounds=color_bounds,
+                object_radius_threshold=object_radius_threshold,
+                width=self.settings.PROCESSING_WIDTH,
+                output_scale=output_scale,
+                detector=self.settings.DETECTOR
             )
-            # Find the contours of the object
-            contours = imutils.grab_contours(cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
-
-            if len(contours) > 0:
-
-                # Find the largest contour in the mask, then compute the minimum enclosing circle and the centroid
-                c = max(contours, key=cv2.contourArea)
-                (x, y), radius = cv2.minEnclosingCircle(c)
-                m = cv2.moments(c)
-                center = (
-                    int(m['m10'] / m['m00']), int(m['m01'] / m['m00'])
-                )
-
-                # Only proceed if the radius is above the threshold
-                if radius >= object_radius_threshold:
-                    object_circles.append((int(x), int(y), int(radius)))
-                    object_centroids.append(center)
-                else:
-                    object_circles.append(None)
-                    object_centroids.append(None)
-            else:
-                object_circles.append(None)
-                object_centroids.append(None)
-
-            if progressbar is not None:
+        motion_gate = detection.MotionGate(self.settings.MOTION_THRESHOLD) if self.settings.MOTION_GATING else None
+        duplicate_detector = detection.DuplicateDetector(self.settings.DUPLICATE_THRESHOLD, max_repeats=self.settings.DUPLICATE_MAX_REPEATS) if self.settings.DUPLICATE_DETECTION else None
+        stride = max(1, self.settings.DETECTION_STRIDE)
+        # Pausing the job pauses the threads of the pipeline as well
+        running = progressbar.running if isinstance(progressbar, jobs.BackgroundJob) else None
+        if self.settings.DETECTION_MODE == 'processes':
+            pipeline = detection.ProcessPoolDetectionPipeline(video_frames, detect, workers, batch_size=batch_size, motion_gate=motion_gate, stride=stride, duplicate_detector=duplicate_detector, running=running)
+        else:
+            # The trackers need the frames in order, processes get a copy of them for each chunk instead
+            if self.settings.DETECTION_REGION in ('roi', 'flow'):
+                workers = 1
+            pipeline = detection.DetectionPipeline(video_frames, detect, workers, batch_size=batch_size, motion_gate=motion_gate, stride=stride, duplicate_detector=duplicate_detector, running=running)
+
+        def preview() -> cv2.typing.MatLike:
+            # Only rendered when the progressbar is redrawn, at most at the processing resolution
+            i, frame, detections = pipeline.latest
+            # The frame belongs to the frame source, it is only drawn on directly once resized
+            resized = frame.shape[1] > self.settings.PROCESSING_WIDTH
+            if resized:
+                frame = imutils.resize(frame, width=self.settings.PROCESSING_WIDTH)
+            for j, (circle, centroid, *_) in enumerate(detections):
+                frame = self._draw_object_position(frame, circle, centroid, frame.shape[1] / video_frames.full_width, copy=j == 0 and not resized)
+            return frame
+
+        def on_progress(processed_count: int, frame_count: int) -> None:
+            if progressbar is not None and pipeline.latest is not None:
                 progressbar.set_progress(
-                    progress=i+1,
+                    progress=processed_count,
                     maximum=frame_count,
-                    text=self.lpack.od.PROCESSING_FRAMES + f' {i}/{frame_count}',
-                    image=self._draw_object_position(frame, object_circles[i], object_centroids[i])
-                )
-        
-        return object_circles, object_centroids
-
-    def _image_to_real_positions(self, image_positions: list[tuple[int, int]], scale_point_1: tuple[int, int], scale_point_2: tuple[int, int], scale_distance: float, origin_point: tuple[int, int], progressbar: frames.DeterminateProgressbarFrame = None) -> list[tuple[float, float]]:
-        '''Convert pixel coordinates from an image to real coordinates using a scale and an origin
-
-        :param list[tuple[int, int]] image_positions: The list of pixel coordinates to be converted, in format (x, y)
-        :param tuple[int, int] scale_point_1: The first point defining the scale
-        :param tuple[int, int] scale_point_2: The second point defining the scale
-        :param float scale_distance: The real distance between the two points defining the scale
-        :param tuple[int, int] origin_point: The pixel coordinates of the origin
-        :param frames.DeterminateProgressbarFrame progressbar: The progressbar to be updated along the process, defaults to None
-        :return list[tuple[int, int]]: The list of real coordinates
-        '''
-
-        # Compute a conversion factor between image and real distances
-        x1, y1, x2, y2 = *scale_point_1, *scale_point_2
-        scale_image_distance = ( (x1 - x2)**2 + (y1 - y2)**2 ) **.5
-        cfactor = scale_distance / scale_image_distance
-
-        # Convert each coordinates on the image to real positions
-        real_positions = []
-        ox, oy = origin_point
-        points_nb = len(image_positions)
-        for i, p in enumerate(image_positions):
-            if p is not None:
-                x, y = p
-                real_positions.append((
-                    cfactor * (x - ox),
-                    cfactor * (y - oy)
-                ))
-            else:
-                real_positions.append(None)
-            if progressbar is not None:
-                progressbar.set_progress(
-                    progress=i+1,
-                    maximum=points_nb,
-                    text=self.lpack.od.CONVERTING_COORDINATES + f' {i}/{points_nb}'
+                    text=self.lpack.od.PROCESSING_FRAMES,
+                    image=preview
                 )
 
-        return real_positions
+        results = pipeline.run(on_progress)
+        statuses = np.array(pipeline.statuses, dtype=object)
+        frame_indexes = np.arange(video_frames.first_frame, video_frames.first_frame + len(results))
+        if motion_gate is not None and self.settings.MOTION_TRIM:
+            start, stop = pipeline.active_window()
+            results, statuses, frame_indexes = results[start:stop], statuses[start:stop], frame_indexes[start:stop]
+
+        # Circles representing detected objects, in format (x, y, radius), and their centroids, in format (x, y)
+        trajectories = [
+            Trajectory.from_detections(
+                circles=[None if detections is None else detections[j][0] for detections in results],
+                centroids=[None if detections is None else detections[j][1] for detections in results],
+                frame_indexes=frame_indexes,
+                fps=video_frames.fps,
+                # The optical flow tracker gives its confidence along with each detection
+                confidences=[None if detections is None else detections[j][2] for detections in results] if self.settings.DETECTION_REGION == 'flow' else None
+            )
+            for j in range(len(color_bounds))
+        ]
+
+        # Duplicates are dropped once their copied positions have served the interpolation of their neighbours
+        duplicates = (statuses == detection.STATUS_DUPLICATE) & self.settings.DROP_DUPLICATES
+
+        # Fill the frames skipped by the stride, and the ones where an object was briefly lost
+        if self.settings.INTERPOLATION != 'none':
+            max_gap = self.settings.INTERPOLATION_MAX_GAP or None
+            if max_gap is not None:
+                max_gap = max(max_gap, stride - 1)
+            for trajectory in trajectories:
+                statuses[trajectory.interpolate(self.settings.INTERPOLATION, max_gap)] = detection.STATUS_INTERPOLATED
+
+        # Skipped frames that were not filled have no positions
+        kept = (statuses != detection.STATUS_SKIPPED) & ~duplicates
+        if not kept.all():
+            trajectories = [trajectory.select(kept) for trajectory in trajectories]
+            statuses = statuses[kept]
+
+        return trajectories, statuses
+
+    def _image_to_real_positions(self, trajectory: Trajectory, calibration: Calibration) -> Trajectory:
+        '''Convert pixel coordinates from an image to real coordinates, all at once.
+
+        :param Trajectory trajectory: The trajectory whose pixel coordinates are converted, NaN where missing
+        :param Calibration calibration: The transform from pixel to real coordinates
+        :return Trajectory: The trajectory in real coordinates, over the same frames, NaN where missing
+        '''
+        x, y = calibration.apply(trajectory.x, trajectory.y)
+        return trajectory.with_positions(x, y, calibration.local_scale(trajectory.x, trajectory.y) * trajectory.radius)
 
-    def _draw_object_position(self, image: cv2.typing.MatLike, circle: tuple[int], centroid: tuple[int]) -> cv2.typing.MatLike:
+    def _draw_object_position(self, image: cv2.typing.MatLike, circle: tuple[int], centroid: tuple[int], scale: float = 1, copy: bool = True) -> cv2.typing.MatLike:
         '''Return an image with the object's representative circle and centroid drawn on it.
 
         :param cv2.typing.MatLike image: Image to draw on.
         :param tuple[int] circle: Circle representing the object, in format (x, y, radius).
         :param tuple[int] centroid: Centroid of the object, in format (x, y).
+        :param float scale: Ratio between the image's resolution and the one of the positions, defaults to 1
+        :param bool copy: Whether to draw on a copy of the image, or on the image itself, defaults to True
         :return cv2.typing.MatLike: Image with the object position drawn.
         '''
-        im_copy = image.copy()
+        im_copy = image.copy() if copy else image
         if circle and centroid:
-            x, y, radius = circle
+            x, y, radius = (int(scale * v) for v in circle)
             cv2.circle(im_copy, (x, y), radius, (0, 255, 0), 2)
-            cv2.circle(im_copy, centroid, 5, (0, 0, 255), -1)
+            cv2.circle(im_copy, (int(scale * centroid[0]), int(scale * centroid[1])), 5, (0, 0, 255), -1)
         return im_copy
 
     def _get_origin_point(self) -> tuple[int, int]:
@@ -299,21 +575,17 @@ class ObjectDetection(frames.SubMenuOption):
         if self.object_as_origin_frame is None:
             origin_point = self.custom_origin_point
         if self.object_as_origin_frame is not None:
-            step = -1 if self.object_as_origin_frame == len(self.video_frames)-1 else 1
-            i = self.object_as_origin_frame
-            found_point = False
-            while i >= 0 and i <= len(self.video_frames) and not found_point:
-                if self.object_centroids[i] is not None:
-                    origin_point = self.object_centroids[i]
-                    found_point = True
-                i += step
+            # The origin is given by the first object, on the selected frame or the closest one where it was found
+            position = self.object_trajectories[0].position_near(self.video_frames.first_frame + self.object_as_origin_frame)
+            if position is not None:
+                origin_point = position
         return origin_point
 
 
 
 class ColorBoundsSelectorFrame(frames.CustomFrame):
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: list[cv2.typing.MatLike]) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: video.FrameSource) -> None:
         super().__init__(parent, color_palette)
         self.lpack = language_pack
 
@@ -324,6 +596,12 @@ class ColorBoundsSelectorFrame(frames.CustomFrame):
         self.video_frames = video_frames
         self.current_image = 0
 
+        # OBJECTS
+        self.color_bounds: list[tuple[tuple[int], tuple[int]]] = [] # Bounds of the objects added before the current one
+        self.current_object_label = tk.Label(self, bg=self.color_palette.BACKGROUND, font=('', 10, 'bold'))
+        self.current_object_label.place(relx=.05, rely=.75, relwidth=.9, relheight=.05)
+        self._update_current_object_label()
+
         # SLIDERS
         slider_params = {
             'master': self.settings_bar,
@@ -388,23 +666,24 @@ class ColorBoundsSelectorFrame(frames.CustomFrame):
         }
         next_text = self.lpack.od.color_bounds_selector_frame.NEXT
         change_image_text = self.lpack.od.color_bounds_selector_frame.CHANGE_IMAGE
+        add_object_text = self.lpack.od.color_bounds_selector_frame.ADD_OBJECT
         self.next_button = tk.Button(text=next_text, **button_params, command=lambda: self.event_generate('<<ColorBoundsSelected>>'))
-        self.next_button.place(relx=.7, rely=.1, relwidth=.25, relheight=.35)
+        self.next_button.place(relx=.7, rely=.05, relwidth=.25, relheight=.25)
+        self.add_object_button = tk.Button(text=add_object_text, **button_params, command=self._on_add_object_button_click)
+        self.add_object_button.place(relx=.7, rely=.375, relwidth=.25, relheight=.25)
         self.change_image_button = tk.Button(text=change_image_text, **button_params, command=self._on_change_image_button_click)
-        self.change_image_button.place(relx=.7, rely=.55, relwidth=.25, relheight=.35)
+        self.change_image_button.place(relx=.7, rely=.7, relwidth=.25, relheight=.25)
+
+    def get_color_bounds(self) -> tuple[tuple[int], tuple[int]]:
+        '''Return the lower and upper HSV bounds currently selected with the sliders.'''
+        lower_bound = (self.lower_h_slider.get(), self.lower_s_slider.get(), self.lower_v_slider.get())
+        upper_bound = (self.upper_h_slider.get(), self.upper_s_slider.get(), self.upper_v_slider.get())
+        return lower_bound, upper_bound
         
     def update_images(self) -> None:
         self.update()
 
-        lower_h = self.lower_h_slider.get()
-        lower_s = self.lower_s_slider.get()
-        lower_v = self.lower_v_slider.get()
-        upper_h = self.upper_h_slider.get()
-        upper_s = self.upper_s_slider.get()
-        upper_v = self.upper_v_slider.get()
-
-        lower_bound = (lower_h, lower_s, lower_v)
-        upper_bound = (upper_h, upper_s, upper_v)
+        lower_bound, upper_bound = self.get_color_bounds()
 
         relx1, relx2, rely = .05, .525, .05
         relwidth, relheight = .425, .7
@@ -421,6 +700,19 @@ class ColorBoundsSelectorFrame(frames.CustomFrame):
         self.current_image = random.randint(0, len(self.video_frames) - 1)
         self.update_images()
 
+    def _on_add_object_button_click(self) -> None:
+        # Keep the current bounds, and start selecting the ones of the next object
+        self.color_bounds.append(self.get_color_bounds())
+        for name in ('lower_h', 'lower_s', 'lower_v'):
+            getattr(self, f'{name}_slider').set(0)
+        for name in ('upper_h', 'upper_s', 'upper_v'):
+            getattr(self, f'{name}_slider').set(255)
+        self._update_current_object_label()
+        self.update_images()
+
+    def _update_current_object_label(self) -> None:
+        self.current_object_label.config(text=self.lpack.od.OBJECT_NAME.replace('{{?}}', str(len(self.color_bounds) + 1)))
+
     def _get_color_mask(self, image: cv2.typing.MatLike, lower_bound: tuple[int], upper_bound: tuple[int]) -> cv2.typing.MatLike:
         '''Returns a mask of the image based on the given color bounds.
 
@@ -445,22 +737,162 @@ class ColorBoundsSelectorFrame(frames.CustomFrame):
 
 
 
+class TimeWindowSelectorFrame(frames.CustomFrame):
+
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_path: str) -> None:
+        super().__init__(parent, color_palette)
+        self.lpack = language_pack
+
+        # Frames are decoded on demand, only the ones at the bounds of the window are shown
+        self.video_frames = video.VideoFrameSource(video_path, cache_size=4)
+        self.fps = self.video_frames.fps
+        self.start_frame: int = 0
+        self.stop_frame: int = len(self.video_frames) # Index after the last frame of the window
+
+        self.settings_bar = tk.Frame(self, bg=self.color_palette.POPUP)
+        self.settings_bar.place(relx=0, rely=.8, relwidth=1, relheight=.2)
+
+        # SLIDERS
+        slider_params = {
+            'master': self.settings_bar,
+            'from_': 0,
+            'to': max(0, len(self.video_frames) - 1),
+            'orient': tk.HORIZONTAL,
+            'showvalue': False,
+            'bg': self.color_palette.POPUP,
+            'bd': 0,
+            'cursor': 'hand2',
+            'activebackground': self.color_palette.HEADER,
+            'highlightthickness': 0,
+            'troughcolor': self.color_palette.HEADER,
+            'command': self._on_slider_update
+        }
+        label_params = {
+            'master': self.settings_bar,
+            'bg': self.color_palette.POPUP,
+            'font': ('', 10),
+            'anchor': 'w',
+        }
+        self.start_slider = tk.Scale(**slider_params)
+        self.end_slider = tk.Scale(**slider_params)
+        self.end_slider.set(slider_params['to'])
+        self.start_label = tk.Label(**label_params)
+        self.end_label = tk.Label(**label_params)
+        self.start_slider.place(relx=.05, rely=.1, relwidth=.3, relheight=.35)
+        self.end_slider.place(relx=.05, rely=.55, relwidth=.3, relheight=.35)
+        self.start_label.place(relx=.375, rely=.1, relwidth=.275, relheight=.35)
+        self.end_label.place(relx=.375, rely=.55, relwidth=.275, relheight=.35)
+
+        # BUTTONS
+        button_params = {
+            'master': self.settings_bar,
+            'font': ('', 10),
+            'bg': self.color_palette.POPUP,
+            'cursor': 'hand2',
+            'activebackground': self.color_palette.HEADER,
+            'borderwidth': 1,
+        }
+        next_text = self.lpack.od.time_window_selector_frame.NEXT
+        whole_video_text = self.lpack.od.time_window_selector_frame.WHOLE_VIDEO
+        self.next_button = tk.Button(text=next_text, **button_params, command=self._on_next_button_click)
+        self.next_button.place(relx=.7, rely=.1, relwidth=.25, relheight=.35)
+        self.whole_video_button = tk.Button(text=whole_video_text, **button_params, command=self._on_whole_video_button_click)
+        self.whole_video_button.place(relx=.7, rely=.55, relwidth=.25, relheight=.35)
+
+        self.start_image: tk.Frame = None
+        self.end_image: tk.Frame = None
+
+    def update_images(self) -> None:
+        self.update()
+
+        start, end = self.start_slider.get(), self.end_slider.get()
+        end_frame, end = self._read_decodable_frame(end)
+        start = min(start, end)
+        start_frame = self.video_frames[start]
+        self.start_label.config(text=self._format_bound(self.lpack.od.time_window_selector_frame.START, start))
+        self.end_label.config(text=self._format_bound(self.lpack.od.time_window_selector_frame.END, end))
+
+        relx1, relx2, rely = .05, .525, .05
+        relwidth, relheight = .425, .7
+        for image in (self.start_image, self.end_image):
+            if image is not None:
+                image.destroy()
+        self.start_image = funcs.get_image_widget_from_cv2(self, start_frame, self.color_palette.BACKGROUND, relwidth, relheight)
+        self.end_image = funcs.get_image_widget_from_cv2(self, end_frame, self.color_palette.BACKGROUND, relwidth, relheight)
+        self.start_image.place(relx=relx1, rely=rely, relwidth=relwidth, relheight=relheight)
+        self.end_image.place(relx=relx2, rely=rely, relwidth=relwidth, relheight=relheight)
+
+    def destroy(self) -> None:
+        self.video_frames.release()
+        super().destroy()
+
+    def _read_decodable_frame(self, index: int) -> tuple[cv2.typing.MatLike, int]:
+        '''Read a frame, falling back to the last decodable one when the frame count given by the container is overestimated.
+        The sliders are then restricted to the decodable frames.
+
+        :param int index: Index of the frame.
+        :return tuple[cv2.typing.MatLike, int]: The frame read and its index.
+        '''
+        while True:
+            # The source lowers its frame count to the index of a frame it fails to decode
+            index = min(index, len(self.video_frames) - 1)
+            try:
+                frame = self.video_frames[index]
+                break
+            except IndexError:
+                if len(self.video_frames) == 0:
+                    raise
+        last_frame = len(self.video_frames) - 1
+        if self.end_slider.cget('to') > last_frame:
+            for slider in (self.start_slider, self.end_slider):
+                slider.config(to=last_frame)
+                slider.set(min(slider.get(), last_frame))
+        return frame, index
+
+    def _format_bound(self, text: str, index: int) -> str:
+        return f'{text} {index / self.fps:.3f} s ({index})'
+
+    def _on_slider_update(self, event: tk.Event) -> None:
+        # The window can't be empty
+        if self.start_slider.get() > self.end_slider.get():
+            self.end_slider.set(self.start_slider.get())
+        self.update_images()
+
+    def _on_whole_video_button_click(self) -> None:
+        self.start_slider.set(0)
+        self.end_slider.set(self.end_slider.cget('to'))
+        self.update_images()
+
+    def _on_next_button_click(self) -> None:
+        self.start_frame = self.start_slider.get()
+        self.stop_frame = self.end_slider.get() + 1
+        if self.start_frame == 0 and self.stop_frame >= len(self.video_frames):
+            self.stop_frame = None # The frame count given by the container can be underestimated
+        self.event_generate('<<TimeWindowSelected>>')
+
+
+
 class ScaleSelectorFrame(frames.CustomFrame):
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: list[cv2.typing.MatLike]) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: video.FrameSource, camera_profile: camera.CameraProfile = None) -> None:
         super().__init__(parent, color_palette)
         self.lpack = language_pack
 
         self.video_frames = video_frames
+        self.camera_profile = camera_profile # Frames are displayed undistorted, so that the selected points are on the undistorted frames
         self.first_point: tuple[int, int] = None
         self.second_point: tuple[int, int] = None
         self.distance: float = None
         self.distance_unit_power: int = 0
         self.distance_unit_str = tk.StringVar()
+        # In plane mode, the scale is given by the corners of a rectangle of the plane of motion, seen in perspective
+        self.plane_mode = False
+        self.corners: list[tuple[int, int]] = []
+        self.height: float = None
 
         self.selected_point = 1
         self.current_image = 0
-        self.canvas = frames.PanZoomCanvas(self, self.color_palette, self.video_frames[self.current_image])
+        self.canvas = frames.PanZoomCanvas(self, self.color_palette, self._full_resolution(self.current_image))
         self.canvas.place(relx=.05, rely=.05, relwidth=.9, relheight=.7)
 
         self.settings_bar = tk.Frame(self, bg=self.color_palette.POPUP)
@@ -479,8 +911,12 @@ class ScaleSelectorFrame(frames.CustomFrame):
         second_point_text = self.lpack.od.scale_selector_frame.SELECT_SECOND_POINT
         self.select_1st_point_btn = tk.Button(text=first_point_text, **button_params, command=self._on_point_1_selection)
         self.select_2nd_point_btn = tk.Button(text=second_point_text, **button_params, command=self._on_point_2_selection)
-        self.select_1st_point_btn.place(relx=.050, rely=.10, relwidth=.25, relheight=.35)
-        self.select_2nd_point_btn.place(relx=.325, rely=.10, relwidth=.25, relheight=.35)
+        self.select_1st_point_btn.place(relx=.050, rely=.10, relwidth=.17, relheight=.35)
+        self.select_2nd_point_btn.place(relx=.235, rely=.10, relwidth=.17, relheight=.35)
+        # plane mode toggle
+        plane_mode_text = self.lpack.od.scale_selector_frame.CORRECT_PERSPECTIVE
+        self.plane_mode_btn = tk.Button(text=plane_mode_text, **button_params, command=self._on_plane_mode_toggle)
+        self.plane_mode_btn.place(relx=.42, rely=.10, relwidth=.155, relheight=.35)
         # other buttons
         next_text = self.lpack.od.scale_selector_frame.NEXT
         change_image_text = self.lpack.od.scale_selector_frame.CHANGE_IMAGE
@@ -492,8 +928,10 @@ class ScaleSelectorFrame(frames.CustomFrame):
         # distance input
         distance_text = self.lpack.od.scale_selector_frame.ENTER_DISTANCE
         self.distance_input_label = tk.Label(self.settings_bar, text=distance_text, bg=self.color_palette.POPUP, font=('', 10), anchor='w', justify='left', wraplength=200)
-        self.distance_input = tk.Entry(self.settings_bar, validate='all', vcmd=(self.register(self._validate_distance_input), '%P'))
+        self.distance_input = tk.Entry(self.settings_bar, validate='all', vcmd=(self.register(self._validate_length_input), '%P', 'distance'))
         self.distance_input.config(font=('', 10), bg=self.color_palette.POPUP, bd=0, cursor='hand2')
+        self.height_input = tk.Entry(self.settings_bar, validate='all', vcmd=(self.register(self._validate_length_input), '%P', 'height'))
+        self.height_input.config(font=('', 10), bg=self.color_palette.POPUP, bd=0, cursor='hand2')
         
         self.distance_input_label.place(relx=.05, rely=.55, relwidth=.25, relheight=.35)
         self.distance_input.place(relx=.325, rely=.55, relwidth=.15, relheight=.35)
@@ -508,7 +946,11 @@ class ScaleSelectorFrame(frames.CustomFrame):
         self.update_selector_buttons()
 
     def update_canvas(self) -> None:
-        self.canvas.change_image(self.video_frames[self.current_image])
+        self.canvas.change_image(self._full_resolution(self.current_image))
+
+    def _full_resolution(self, index: int) -> cv2.typing.MatLike:
+        image = self.video_frames.full_resolution(index)
+        return image if self.camera_profile is None else self.camera_profile.undistort_image(image)
 
     def _on_point_1_selection(self) -> None:
         self.selected_point = 1
@@ -518,29 +960,57 @@ class ScaleSelectorFrame(frames.CustomFrame):
         self.selected_point = 2
         self.update_selector_buttons()
 
+    def _on_plane_mode_toggle(self) -> None:
+        self.plane_mode = not self.plane_mode
+        self.selected_point = 1
+        lpack = self.lpack.od.scale_selector_frame
+        if self.plane_mode:
+            # A single button selects the corners one after the other, and the height of the rectangle is entered next to its width
+            self.select_1st_point_btn.place_configure(relwidth=.355)
+            self.select_2nd_point_btn.place_forget()
+            self.distance_input.place_configure(relwidth=.075)
+            self.height_input.place(relx=.4, rely=.55, relwidth=.075, relheight=.35)
+            self.distance_input_label.config(text=lpack.ENTER_SIZE)
+            self.corners = []
+        else:
+            self.select_1st_point_btn.config(text=lpack.SELECT_FIRST_POINT)
+            self.select_1st_point_btn.place_configure(relwidth=.17)
+            self.select_2nd_point_btn.place(relx=.235, rely=.10, relwidth=.17, relheight=.35)
+            self.distance_input.place_configure(relwidth=.15)
+            self.height_input.place_forget()
+            self.distance_input_label.config(text=lpack.ENTER_DISTANCE)
+        self.update_selector_buttons()
+        self._mark_points()
+
     def update_selector_buttons(self) -> None:
         self.select_1st_point_btn.config(relief=tk.RAISED, bg=self.color_palette.POPUP)
         self.select_2nd_point_btn.config(relief=tk.RAISED, bg=self.color_palette.POPUP)
+        self.plane_mode_btn.config(relief=tk.RAISED, bg=self.color_palette.POPUP)
+        if self.plane_mode:
+            self.plane_mode_btn.config(relief=tk.SUNKEN, bg=self.color_palette.HEADER)
+            corners_text = self.lpack.od.scale_selector_frame.SELECT_CORNERS.replace('{{?}}', str(len(self.corners)))
+            self.select_1st_point_btn.config(text=corners_text)
         if self.selected_point == 1:
             self.select_1st_point_btn.config(relief=tk.SUNKEN, bg=self.color_palette.HEADER)
         elif self.selected_point == 2:
             self.select_2nd_point_btn.config(relief=tk.SUNKEN, bg=self.color_palette.HEADER)
         self.update()
 
-    def _validate_distance_input(self, input_str: str) -> bool:
-        '''Validate the distance input.
+    def _validate_length_input(self, input_str: str, name: str) -> bool:
+        '''Validate a length input.
 
         :param str input_str: Input string.
+        :param str name: The name of the length, distance or height, which is set along with its input's color.
         :return bool: True if the input is valid, False otherwise.
         '''
         try:
-            self.distance = float(input_str)
+            setattr(self, name, float(input_str))
             valid = True
-            self.distance_input.config(bg=self.color_palette.POPUP)
+            getattr(self, f'{name}_input').config(bg=self.color_palette.POPUP)
         except ValueError:
             valid = False
         if input_str == '':
-            self.distance = None
+            setattr(self, name, None)
             valid = True
         return valid
 
@@ -555,7 +1025,13 @@ class ScaleSelectorFrame(frames.CustomFrame):
         self.update_canvas()
 
     def _on_pixel_clicked(self, event: tk.Event) -> None:
-        if self.selected_point == 1:
+        if self.plane_mode:
+            if self.selected_point == 1:
+                # Selecting the corners again starts over
+                if len(self.corners) == 4: self.corners = []
+                self.corners.append((event.x, event.y))
+                if len(self.corners) == 4: self.selected_point = 0
+        elif self.selected_point == 1:
             self.first_point = (event.x, event.y)
             self.selected_point = 2
         elif self.selected_point == 2:
@@ -563,16 +1039,30 @@ class ScaleSelectorFrame(frames.CustomFrame):
             self.selected_point = 0
         
         self.update_selector_buttons()
-        self.canvas.mark_image_points(self.first_point, self.second_point)
+        self._mark_points()
+
+    def _mark_points(self) -> None:
+        if self.plane_mode:
+            self.canvas.mark_image_points(*self.corners)
+        else:
+            self.canvas.mark_image_points(self.first_point, self.second_point)
 
     def _on_next_button_click(self) -> None:
         valid_inputs = True
-        if self.first_point is None:
-            self.select_1st_point_btn.config(bg=self.color_palette.WARNING)
-            valid_inputs = False
-        if self.second_point is None:
-            self.select_2nd_point_btn.config(bg=self.color_palette.WARNING)
-            valid_inputs = False
+        if self.plane_mode:
+            if len(self.corners) != 4:
+                self.select_1st_point_btn.config(bg=self.color_palette.WARNING)
+                valid_inputs = False
+            if self.height is None:
+                self.height_input.config(bg=self.color_palette.WARNING)
+                valid_inputs = False
+        else:
+            if self.first_point is None:
+                self.select_1st_point_btn.config(bg=self.color_palette.WARNING)
+                valid_inputs = False
+            if self.second_point is None:
+                self.select_2nd_point_btn.config(bg=self.color_palette.WARNING)
+                valid_inputs = False
         if self.distance is None:
             self.distance_input.config(bg=self.color_palette.WARNING)
             valid_inputs = False
@@ -582,13 +1072,14 @@ class ScaleSelectorFrame(frames.CustomFrame):
 
 class OriginSelectorFrame(frames.CustomFrame):
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: list[cv2.typing.MatLike]) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, video_frames: video.FrameSource, camera_profile: camera.CameraProfile = None) -> None:
         super().__init__(parent, color_palette)
         self.lpack = language_pack
 
         self.video_frames = video_frames
+        self.camera_profile = camera_profile # Frames are displayed undistorted, so that the selected points are on the undistorted frames
         self.current_image = 0
-        self.canvas = frames.PanZoomCanvas(self, self.color_palette, self.video_frames[self.current_image])
+        self.canvas = frames.PanZoomCanvas(self, self.color_palette, self._full_resolution(self.current_image))
         self.canvas.place(relx=.05, rely=.05, relwidth=.9, relheight=.7)
 
         self.object_as_origin_frame: int = None
@@ -628,7 +1119,11 @@ class OriginSelectorFrame(frames.CustomFrame):
         self.update_buttons()
 
     def update_canvas(self) -> None:
-        self.canvas.change_image(self.video_frames[self.current_image])
+        self.canvas.change_image(self._full_resolution(self.current_image))
+
+    def _full_resolution(self, index: int) -> cv2.typing.MatLike:
+        image = self.video_frames.full_resolution(index)
+        return image if self.camera_profile is None else self.camera_profile.undistort_image(image)
 
     def update_buttons(self) -> None:
         self.custom_origin_btn.config(relief=tk.RAISED, bg=self.color_palette.POPUP)
@@ -685,16 +1180,18 @@ class OriginSelectorFrame(frames.CustomFrame):
 
 class SaveFrame(frames.CustomFrame):
 
-    available_file_extensions = ['.csv', '.ods', '.xlsx']
+    available_file_extensions = ['.csv', '.ods', '.xlsx'] + export.columnar_file_extensions
     available_time_units = ['s', 'ms']
 
-    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, object_positions: list[tuple[int, int]], unit: str, time_interval: float) -> None:
+    def __init__(self, parent: tk.Frame, color_palette: enums.ColorPaletteEnum, language_pack: enums.LanguagePackEnum, object_trajectories: list[Trajectory], object_names: list[str], frame_statuses: np.ndarray, unit: str, metadata: dict = None) -> None:
         super().__init__(parent, color_palette)
         self.lpack = language_pack
 
-        self.object_positions = object_positions
+        self.object_trajectories = object_trajectories # The trajectory of each object, all over the same frames
+        self.object_names = object_names
+        self.frame_statuses = frame_statuses
         self.positions_unit = unit
-        self.positions_time_interval = time_interval
+        self.metadata = metadata or {} # Embedded in the columnar formats
 
         self.file_extension = tk.StringVar(value=self.available_file_extensions[0])
         self.x_column_name = tk.StringVar(value='X')
@@ -704,6 +1201,7 @@ class SaveFrame(frames.CustomFrame):
         self.round_values = tk.BooleanVar(value=False)
         self.decimal_places: int = 2
         self.invert_y_axis = tk.BooleanVar(value=False)
+        self.include_status = tk.BooleanVar(value=False)
 
         self.options_frame = tk.Frame(self, bg=self.color_palette.POPUP)
         self.options_frame.place(relx=.2, rely=.1, relwidth=.6, relheight=.8)
@@ -757,6 +1255,12 @@ class SaveFrame(frames.CustomFrame):
         self.file_format_selector.config(**option_menu_params)
         self.file_format_selector.place(relx=.55, rely=.1, relwidth=.35, relheight=.05)
 
+        if export.pyarrow is None or export.tables is None:
+            optional_formats_text = self.lpack.od.save_frame.OPTIONAL_FORMATS
+            optional_formats_label_params = label_params.copy()
+            optional_formats_label_params['font'] = ('', 8, 'italic')
+            tk.Label(text=optional_formats_text, **optional_formats_label_params).place(relx=.1, rely=.15, relwidth=.8, relheight=.04)
+
         x_column_text = self.lpack.od.save_frame.X_COLUMN_NAME
         tk.Label(text=x_column_text, **label_params).place(relx=.1, rely=.2, relwidth=.35, relheight=.05)
         self.x_column_name_entry = tk.Entry(**entry_params, textvariable=self.x_column_name)
@@ -792,6 +1296,11 @@ class SaveFrame(frames.CustomFrame):
         self.invert_y_axis_checkbox = tk.Checkbutton(**checkbox_params, variable=self.invert_y_axis)
         self.invert_y_axis_checkbox.place(relx=.55, rely=.5, relwidth=.05, relheight=.05)
 
+        include_status_text = self.lpack.od.save_frame.INCLUDE_STATUS
+        tk.Label(text=include_status_text, **label_params).place(relx=.1, rely=.55, relwidth=.35, relheight=.05)
+        self.include_status_checkbox = tk.Checkbutton(**checkbox_params, variable=self.include_status)
+        self.include_status_checkbox.place(relx=.55, rely=.55, relwidth=.05, relheight=.05)
+
         save_text = self.lpack.od.save_frame.SAVE
         self.save_btn = tk.Button(text=save_text, **button_params, command=self._on_save_btn_click)
         self.save_btn.place(relx=.35, rely=.9, relwidth=.3, relheight=.05)
@@ -822,39 +1331,50 @@ class SaveFrame(frames.CustomFrame):
     def _on_save_btn_click(self) -> None:
         filetype = self.file_extension.get()
         filepath = filedialog.asksaveasfilename(defaultextension=filetype)
+        if not filepath:
+            return # The dialog was cancelled
 
         time_col_name = self.lpack.od.save_frame.TIME_COLUMN_NAME + f' ({self.time_unit.get()})'
         time_power_factor = 3 if self.time_unit.get() == 'ms' else 1
-        x_col_name = self.x_column_name.get().replace(',', ' ')
-        y_col_name = self.y_column_name.get().replace(',', ' ')
-        if self.include_unit.get():
-            x_col_name += f' ({self.positions_unit})'
-            y_col_name += f' ({self.positions_unit})'
-
-        time_values, x_values, y_values = [], [], []
-        for i, p in enumerate(self.object_positions):
-            if p is not None:
-                time_values.append(i * self.positions_time_interval * 10**time_power_factor)
-                x_values.append(p[0])
-                y_values.append(p[1])
+        unit_suffix = f' ({self.positions_unit})' if self.include_unit.get() else ''
+        # Columnar formats keep the types of the columns
+        columnar = filetype in export.columnar_file_extensions
 
+        # Only keep the frames where at least one object was detected, the cells of the missing objects are left empty
+        rows = np.logical_or.reduce([trajectory.valid for trajectory in self.object_trajectories])
+        time_values = self.object_trajectories[0].times[rows] * 10**time_power_factor
         if self.round_values.get() is True:
-            for i in range(len(time_values)):
-                time_values[i] = round(time_values[i], self.decimal_places)
-                x_values[i] = round(x_values[i], self.decimal_places)
-                y_values[i] = round(y_values[i], self.decimal_places)
-
-        # Condition is inverted because coordinates are by default from top to bottom
-        # ( y values are already inverted by default )
-        if self.invert_y_axis.get() is False:
-            for i in range(len(time_values)):
-                y_values[i] *= -1
-
-        data = pd.DataFrame({
-            time_col_name: time_values,
-            x_col_name: x_values,
-            y_col_name: y_values
-        })
+            time_values = time_values.round(self.decimal_places)
+        columns = {time_col_name: time_values}
+
+        for name, trajectory in zip(self.object_names, self.object_trajectories):
+            # Columns are only named after the objects when there are several of them
+            name_suffix = f' {name}' if len(self.object_trajectories) > 1 else ''
+            x_col_name = self.x_column_name.get().replace(',', ' ') + name_suffix + unit_suffix
+            y_col_name = self.y_column_name.get().replace(',', ' ') + name_suffix + unit_suffix
+
+            x_values, y_values = trajectory.x[rows], trajectory.y[rows]
+            if self.round_values.get() is True:
+                x_values, y_values = x_values.round(self.decimal_places), y_values.round(self.decimal_places)
+            # Condition is inverted because coordinates are by default from top to bottom
+            # ( y values are already inverted by default )
+            if self.invert_y_axis.get() is False:
+                y_values = -y_values
+
+            columns[x_col_name] = x_values
+            columns[y_col_name] = y_values
+
+        if self.include_status.get():
+            statuses = self.frame_statuses[rows]
+            columns[self.lpack.od.save_frame.STATUS_COLUMN_NAME] = pd.Categorical(statuses) if columnar else statuses
+            # The confidence of the tracking, for the trackers measuring one
+            for name, trajectory in zip(self.object_names, self.object_trajectories):
+                if np.isnan(trajectory.confidence).all():
+                    continue
+                name_suffix = f' {name}' if len(self.object_trajectories) > 1 else ''
+                columns[self.lpack.od.save_frame.CONFIDENCE_COLUMN_NAME + name_suffix] = trajectory.confidence[rows]
+
+        data = pd.DataFrame(columns)
 
         if filetype == '.csv':
             data.to_csv(filepath, index=False)
@@ -865,3 +1385,8 @@ class SaveFrame(frames.CustomFrame):
         elif filetype == '.ods':
             with pd.ExcelWriter(filepath, engine='odf') as writer:
                 data.to_excel(writer, index=False)
+
+        elif columnar:
+            metadata = {**self.metadata, 'time_unit': self.time_unit.get(), 'y_axis_upward': not self.invert_y_axis.get()}
+            # The format is the selected one, whatever the extension typed in the dialog
+            export.write_columnar(data, filepath, metadata, filetype)
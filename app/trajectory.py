@@ -0,0 +1,152 @@
+import numpy as np
+
+
+
+class Trajectory:
+    '''Positions of a tracked object over the frames of a video, stored as NumPy columns.
+
+    Each row is a frame: its index in the video, its time, the position of the object's centroid and
+    the radius of the circle enclosing it, whether the object was found on it, and the confidence of the tracker
+    that found it, for the trackers measuring one. Missing positions and confidences are NaN,
+    so that the columns can go through vectorized operations without being filtered first.
+    Coordinates are kept in double precision, so that the real coordinates are exported as computed.
+    A row takes 45 bytes, where the lists of tuples and None it replaces took a few hundred.
+    '''
+
+    __slots__ = ('frame_indexes', 'times', 'x', 'y', 'radius', 'valid', 'confidence')
+
+    def __init__(self, frame_indexes: np.ndarray, times: np.ndarray, x: np.ndarray, y: np.ndarray, radius: np.ndarray, valid: np.ndarray = None, confidence: np.ndarray = None) -> None:
+        '''
+        :param np.ndarray frame_indexes: The index of each frame in the video.
+        :param np.ndarray times: The time of each frame, in seconds.
+        :param np.ndarray x: The x coordinate of the object on each frame, NaN where it is missing.
+        :param np.ndarray y: The y coordinate of the object on each frame, NaN where it is missing.
+        :param np.ndarray radius: The radius of the object on each frame, NaN where it is missing.
+        :param np.ndarray valid: Whether the object was found on each frame, defaults to None (where x is not NaN)
+        :param np.ndarray confidence: The confidence of the tracking on each frame, between 0 and 1, defaults to None (NaN, not measured)
+        '''
+        self.frame_indexes = np.asarray(frame_indexes, dtype=np.int32)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.valid = ~np.isnan(self.x) if valid is None else np.asarray(valid, dtype=bool)
+        self.confidence = np.full(len(self.x), np.nan) if confidence is None else np.asarray(confidence, dtype=np.float64)
+
+    @classmethod
+    def from_detections(cls, circles: list[tuple[int] | None], centroids: list[tuple[int] | None], frame_indexes: list[int], fps: float, confidences: list[float | None] = None) -> 'Trajectory':
+        '''Build a trajectory from the results of the detection.
+
+        :param list[tuple[int] | None] circles: The circle enclosing the object on each frame, in format (x, y, radius), or None.
+        :param list[tuple[int] | None] centroids: The centroid of the object on each frame, in format (x, y), or None.
+        :param list[int] frame_indexes: The index of each frame in the video.
+        :param float fps: The frame rate of the video.
+        :param list[float | None] confidences: The confidence of the tracker on each frame, or None, defaults to None (not measured)
+        :return Trajectory: The trajectory.
+        '''
+        nan = (np.nan, np.nan)
+        points = np.array([nan if c is None else c for c in centroids], dtype=np.float64).reshape(-1, 2)
+        radius = np.array([np.nan if c is None else c[2] for c in circles], dtype=np.float64)
+        if confidences is not None:
+            confidences = np.array([np.nan if c is None else c for c in confidences], dtype=np.float64)
+        frame_indexes = np.asarray(frame_indexes, dtype=np.int32)
+        return cls(frame_indexes, frame_indexes / fps, points[:, 0], points[:, 1], radius, confidence=confidences)
+
+    def __len__(self) -> int:
+        return len(self.frame_indexes)
+
+    @property
+    def nbytes(self) -> int:
+        '''The memory taken by the columns, in bytes.'''
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @property
+    def positions(self) -> np.ndarray:
+        '''The positions of the object, in format (N, 2), NaN where it is missing.'''
+        return np.column_stack((self.x, self.y))
+
+    def with_positions(self, x: np.ndarray, y: np.ndarray, radius: np.ndarray = None) -> 'Trajectory':
+        '''Return a trajectory over the same frames, with other coordinates, e.g. converted to real units.
+
+        :param np.ndarray x: The new x coordinates.
+        :param np.ndarray y: The new y coordinates.
+        :param np.ndarray radius: The new radii, defaults to None (unchanged)
+        :return Trajectory: The trajectory.
+        '''
+        return Trajectory(self.frame_indexes, self.times, x, y, self.radius if radius is None else radius, self.valid, self.confidence)
+
+    def select(self, rows: np.ndarray) -> 'Trajectory':
+        '''Return the trajectory restricted to some frames.
+
+        :param np.ndarray rows: A boolean mask, or the indexes, of the rows to keep.
+        :return Trajectory: The trajectory.
+        '''
+        return Trajectory(self.frame_indexes[rows], self.times[rows], self.x[rows], self.y[rows], self.radius[rows], self.valid[rows], self.confidence[rows])
+
+    def position_near(self, frame_index: int) -> tuple[float, float]:
+        '''Return the first position found from a frame onward, or the last one found before it if there is none.
+
+        :param int frame_index: The index of the frame in the video.
+        :return tuple[float, float]: The position, in format (x, y), or None if the object was never found.
+        '''
+        rows = np.flatnonzero(self.valid)
+        if len(rows) == 0:
+            return None
+        after = rows[self.frame_indexes[rows] >= frame_index]
+        row = after[0] if len(after) > 0 else rows[-1]
+        return float(self.x[row]), float(self.y[row])
+
+    def interpolate(self, method: str = 'linear', max_gap: int = None) -> np.ndarray:
+        '''Fill the missing positions from the positions around them, in place.
+        Only the gaps between two known positions are filled, the trajectory is never extrapolated.
+
+        The cubic interpolation is a piecewise cubic Hermite curve through the known positions (Catmull-Rom),
+        whose tangents are the slopes between the neighbouring known positions: unlike a global spline,
+        it only depends on the two known positions on each side of a gap, so a wrong detection can't make the whole curve oscillate.
+
+        :param str method: linear or cubic, defaults to 'linear'
+        :param int max_gap: The maximum number of consecutive missing frames that are filled, defaults to None (no limit)
+        :return np.ndarray: Whether each row was filled.
+        '''
+        if method not in ('linear', 'cubic'):
+            raise ValueError(f'Unknown interpolation method: {method}')
+        filled = np.zeros(len(self), dtype=bool)
+        known = np.flatnonzero(self.valid)
+        if len(known) < 2:
+            return filled
+
+        # Missing rows between two known rows, in gaps that are not too long
+        t = self.frame_indexes.astype(np.float64)
+        gaps = np.diff(known) - 1
+        if max_gap is not None:
+            gaps[np.diff(t[known]) - 1 > max_gap] = 0
+        if not gaps.any():
+            return filled
+        segments = np.repeat(np.arange(len(gaps)), gaps) # Index in known of the row before each missing one
+        rows = np.concatenate([np.arange(known[k] + 1, known[k + 1]) for k in np.flatnonzero(gaps)])
+
+        points = np.column_stack((self.x, self.y, self.radius))[known]
+        tk = t[known]
+        t0, t1 = tk[segments], tk[segments + 1]
+        p0, p1 = points[segments], points[segments + 1]
+        if method == 'linear':
+            s = ((t[rows] - t0) / (t1 - t0))[:, None]
+            interpolated = p0 + s * (p1 - p0)
+        else:
+            # Tangents at the known positions, one-sided at both ends of the trajectory
+            tangents = np.empty_like(points)
+            tangents[1:-1] = (points[2:] - points[:-2]) / (tk[2:] - tk[:-2])[:, None]
+            tangents[0] = (points[1] - points[0]) / (tk[1] - tk[0])
+            tangents[-1] = (points[-1] - points[-2]) / (tk[-1] - tk[-2])
+            h = (t1 - t0)[:, None]
+            s = (t[rows] - t0)[:, None] / h
+            s2, s3 = s * s, s * s * s
+            interpolated = (
+                (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * tangents[segments]
+                + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * h * tangents[segments + 1]
+            )
+
+        self.x[rows], self.y[rows], self.radius[rows] = interpolated.T
+        self.valid[rows] = True
+        filled[rows] = True
+        return filled
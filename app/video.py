@@ -0,0 +1,701 @@
+import os
+import cv2
+import time
+import weakref
+import hashlib
+import threading
+import collections
+import numpy as np
+import concurrent.futures
+from typing import Callable, Iterator
+from multiprocessing import shared_memory
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+
+class VideoFrameSource:
+    '''Random access to the frames of a video file, decoded on demand.
+
+    Frames are never all held in memory: they are decoded when requested, seeking
+    in the file if needed, and only the most recently used ones are kept in a small
+    LRU cache. The object behaves like a read-only sequence of frames.
+
+    The source can be restricted to a window of the video, in which case its index 0
+    is the frame first_frame of the video, and frames outside the window are never decoded.
+    '''
+
+    def __init__(self, video_path: str, cache_size: int = 16, start: int = 0, stop: int = None) -> None:
+        '''
+        :param str video_path: Path to the video file.
+        :param int cache_size: Number of recently used frames kept in memory, defaults to 16
+        :param int start: Index of the first frame of the window in the video, defaults to 0
+        :param int stop: Index after the last frame of the window in the video, defaults to None (end of the video)
+        '''
+        self.video_path = video_path
+        self.cache_size = cache_size
+
+        self._capture = cv2.VideoCapture(video_path)
+        if not self._capture.isOpened():
+            raise IOError(f'Unable to open the video file: {video_path}')
+        self.fps: float = self._capture.get(cv2.CAP_PROP_FPS)
+        self.first_frame, stop = _clip_window(int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT)), start, stop)
+        self.frame_count: int = stop - self.first_frame
+        self.width: int = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height: int = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Frames are given at full resolution
+        self.full_width, self.full_height = self.width, self.height
+        self.scale: float = 1
+
+        self._next_index = -self.first_frame # Index in the window of the frame the capture will return on its next read
+        self._cache: collections.OrderedDict[int, cv2.typing.MatLike] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, index: int) -> cv2.typing.MatLike:
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f'Frame index out of range: {index}')
+
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+
+            # Only seek when the frame is not the next one in the stream, seeking is expensive
+            if index != self._next_index:
+                _seek(self._capture, self.first_frame + index)
+            ret, frame = self._capture.read()
+            if not ret:
+                # The frame count given by the container can be overestimated
+                self._next_index = -1
+                self.frame_count = min(self.frame_count, index)
+                raise IndexError(f'Unable to decode frame {index}')
+            self._next_index = index + 1
+
+            self._cache[index] = frame
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return frame
+
+    def __iter__(self) -> Iterator[cv2.typing.MatLike]:
+        return self.iter_frames()
+
+    def full_resolution(self, index: int) -> cv2.typing.MatLike:
+        '''Return a frame at the full resolution of the video.
+
+        :param int index: Index of the frame.
+        :return cv2.typing.MatLike: The frame.
+        '''
+        return self[index]
+
+    def thumbnail(self, index: int, width: int = 160) -> cv2.typing.MatLike:
+        '''Return a low resolution version of a frame, for display purposes.
+
+        :param int index: Index of the frame.
+        :param int width: The width of the thumbnail, defaults to 160
+        :return cv2.typing.MatLike: The thumbnail.
+        '''
+        return cv2.resize(self[index], _scaled_size(self.width, self.height, width), interpolation=cv2.INTER_AREA)
+
+    def iter_frames(self, start: int = 0, stop: int = None, step: int = 1) -> Iterator[cv2.typing.MatLike]:
+        '''Decode the frames sequentially, without caching them.
+        A dedicated capture is used so that random accesses made meanwhile are not disturbed.
+
+        :param int start: Index of the first frame, defaults to 0
+        :param int stop: Index after the last frame, defaults to None (end of the window)
+        :param int step: Only every step-th frame is decoded, the others are grabbed without being converted, defaults to 1
+        :return Iterator[cv2.typing.MatLike]: The decoded frames.
+        '''
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        capture = cv2.VideoCapture(self.video_path)
+        _seek(capture, self.first_frame + start)
+        try:
+            i = start
+            while i < stop:
+                if (i - start) % step != 0:
+                    ret = capture.grab()
+                else:
+                    ret, frame = capture.read()
+                if not ret:
+                    self.frame_count = i
+                    break
+                if (i - start) % step == 0:
+                    yield frame
+                i += 1
+        finally:
+            capture.release()
+
+    def release(self) -> None:
+        '''Release the underlying video capture and clear the cache.'''
+        with self._lock:
+            self._capture.release()
+            self._cache.clear()
+
+
+
+class FrameStore:
+    '''Frames of a video decoded in memory, with the same interface as VideoFrameSource.
+
+    The frames are kept at the processing resolution in a single contiguous (N, H, W, 3)
+    uint8 array, which can live in a shared memory block released along with the store.
+    Full resolution frames are decoded on demand from the file.
+
+    The store must only be released once nothing reads it anymore, i.e. once the jobs using it have returned.
+    Reading it afterwards raises a ValueError, and the frames already handed out stay valid:
+    the shared memory block is only unmapped once the last of them has been garbage collected.
+    '''
+
+    def __init__(self, video_path: str, frames: np.ndarray, fps: float, full_size: tuple[int, int], shm: shared_memory.SharedMemory = None, first_frame: int = 0) -> None:
+        '''
+        :param str video_path: Path to the video file the frames were decoded from.
+        :param np.ndarray frames: The decoded frames, in format (N, H, W, 3).
+        :param float fps: The frame rate of the video.
+        :param tuple[int, int] full_size: The full resolution of the video, in format (width, height).
+        :param shared_memory.SharedMemory shm: The shared memory block holding the frames, if any, defaults to None
+        :param int first_frame: Index in the video of the first frame, when only a window of the video was decoded, defaults to 0
+        '''
+        self.video_path = video_path
+        self.frames = frames
+        self.fps = fps
+        self.first_frame = first_frame
+        self.frame_count: int = frames.shape[0]
+        self.height: int = frames.shape[1]
+        self.width: int = frames.shape[2]
+        self.full_width, self.full_height = full_size
+        self.scale: float = self.width / self.full_width # Ratio between the stored and full resolutions
+        self._shm = shm
+        self._full_resolution_source: VideoFrameSource = None
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, index: int) -> cv2.typing.MatLike:
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f'Frame index out of range: {index}')
+        frames = self.frames
+        if frames is None:
+            raise ValueError('The frames of the store were released')
+        return frames[index]
+
+    def __iter__(self) -> Iterator[cv2.typing.MatLike]:
+        return self.iter_frames()
+
+    def full_resolution(self, index: int) -> cv2.typing.MatLike:
+        '''Return a frame at the full resolution of the video, decoding it from the file if needed.
+
+        :param int index: Index of the frame.
+        :return cv2.typing.MatLike: The frame.
+        '''
+        if self.scale == 1:
+            return self[index]
+        if self._full_resolution_source is None:
+            self._full_resolution_source = VideoFrameSource(self.video_path, cache_size=4, start=self.first_frame)
+        return self._full_resolution_source[index]
+
+    def thumbnail(self, index: int, width: int = 160) -> cv2.typing.MatLike:
+        '''Return a low resolution version of a frame, for display purposes.
+
+        :param int index: Index of the frame.
+        :param int width: The width of the thumbnail, defaults to 160
+        :return cv2.typing.MatLike: The thumbnail.
+        '''
+        return cv2.resize(self[index], _scaled_size(self.width, self.height, width), interpolation=cv2.INTER_AREA)
+
+    def iter_frames(self, start: int = 0, stop: int = None, step: int = 1) -> Iterator[cv2.typing.MatLike]:
+        '''Iterate over the frames.
+
+        :param int start: Index of the first frame, defaults to 0
+        :param int stop: Index after the last frame, defaults to None (end of the video)
+        :param int step: Only every step-th frame is given, defaults to 1
+        :return Iterator[cv2.typing.MatLike]: The frames.
+        '''
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        for i in range(start, stop, step):
+            yield self[i]
+
+    def release(self) -> None:
+        '''Release the memory holding the frames, see the class documentation. Releasing the store again does nothing.'''
+        frames, self.frames = self.frames, None
+        if self._full_resolution_source is not None:
+            self._full_resolution_source.release()
+            self._full_resolution_source = None
+        if self._shm is not None:
+            # Frames may still be referenced, e.g. by a preview: the name is removed now, the memory once they are all gone
+            root = frames
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            weakref.finalize(root, self._shm.close)
+            self._shm.unlink()
+            self._shm = None
+
+
+
+class CompressedFrameStore:
+    '''Frames of a video kept compressed in memory, with the same interface as VideoFrameSource.
+
+    Each frame is stored encoded (PNG, JPEG or lz4) at the processing resolution and decoded when
+    accessed, the most recently decoded frames being kept in a small LRU cache. Videos with a
+    static background compress well, so this keeps long recordings in memory without a disk cache.
+    '''
+
+    codecs = ('png', 'jpeg', 'lz4')
+
+    def __init__(self, video_path: str, fps: float, full_size: tuple[int, int], shape: tuple[int, int, int], codec: str = 'png', jpeg_quality: int = 95, cache_size: int = 32, first_frame: int = 0) -> None:
+        '''
+        :param str video_path: Path to the video file the frames are decoded from.
+        :param float fps: The frame rate of the video.
+        :param tuple[int, int] full_size: The full resolution of the video, in format (width, height).
+        :param tuple[int, int, int] shape: The shape of the stored frames, in format (H, W, 3).
+        :param str codec: The codec used to compress the frames, one of png (lossless), jpeg (lossy) or lz4 (lossless, requires the lz4 package), defaults to 'png'
+        :param int jpeg_quality: The quality of the JPEG compression, from 0 to 100, defaults to 95
+        :param int cache_size: Number of recently used frames kept decoded, defaults to 32
+        :param int first_frame: Index in the video of the first frame, when only a window of the video is stored, defaults to 0
+        '''
+        if codec not in self.codecs:
+            raise ValueError(f'Unknown codec: {codec}')
+        if codec == 'lz4' and lz4 is None:
+            raise ImportError('The lz4 package is required to compress frames with lz4.')
+
+        self.video_path = video_path
+        self.fps = fps
+        self.first_frame = first_frame
+        self.codec = codec
+        self.jpeg_quality = jpeg_quality
+        self.cache_size = cache_size
+        self.frame_count: int = 0
+        self.height, self.width = shape[:2]
+        self.full_width, self.full_height = full_size
+        self.scale: float = self.width / self.full_width # Ratio between the stored and full resolutions
+
+        self.encoded_frames: list[bytes] = []
+        self._shape = shape
+        self._cache: collections.OrderedDict[int, cv2.typing.MatLike] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._full_resolution_source: VideoFrameSource = None
+        self._decode_time = 0.
+        self._decode_count = 0
+
+    @property
+    def compressed_size(self) -> int:
+        '''The total size of the encoded frames, in bytes.'''
+        return sum(len(f) for f in self.encoded_frames)
+
+    @property
+    def compression_ratio(self) -> float:
+        '''The ratio between the size of the raw frames and the size of the encoded frames.'''
+        return self.frame_count * int(np.prod(self._shape)) / max(1, self.compressed_size)
+
+    @property
+    def access_latency(self) -> float:
+        '''The mean time taken to decode a frame that was not in the cache, in seconds.'''
+        return self._decode_time / max(1, self._decode_count)
+
+    def encode(self, frame: cv2.typing.MatLike) -> bytes:
+        '''Encode a frame with the codec of the store.
+        This method does not modify the store, it can be called from several threads at once.
+
+        :param cv2.typing.MatLike frame: The frame to encode.
+        :return bytes: The encoded frame.
+        '''
+        if self.codec == 'lz4':
+            return lz4.frame.compress(np.ascontiguousarray(frame).data)
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality] if self.codec == 'jpeg' else []
+        return cv2.imencode('.jpg' if self.codec == 'jpeg' else '.png', frame, params)[1].tobytes()
+
+    def append(self, encoded_frame: bytes) -> None:
+        '''Add an encoded frame at the end of the store.
+
+        :param bytes encoded_frame: The frame, as returned by encode.
+        '''
+        self.encoded_frames.append(encoded_frame)
+        self.frame_count += 1
+
+    def _decode(self, encoded_frame: bytes) -> cv2.typing.MatLike:
+        if self.codec == 'lz4':
+            return np.frombuffer(lz4.frame.decompress(encoded_frame), dtype=np.uint8).reshape(self._shape)
+        return cv2.imdecode(np.frombuffer(encoded_frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, index: int) -> cv2.typing.MatLike:
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f'Frame index out of range: {index}')
+
+        with self._lock:
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+
+        t = time.perf_counter()
+        frame = self._decode(self.encoded_frames[index])
+        with self._lock:
+            self._decode_time += time.perf_counter() - t
+            self._decode_count += 1
+            self._cache[index] = frame
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return frame
+
+    def __iter__(self) -> Iterator[cv2.typing.MatLike]:
+        return self.iter_frames()
+
+    def full_resolution(self, index: int) -> cv2.typing.MatLike:
+        '''Return a frame at the full resolution of the video, decoding it from the file.
+
+        :param int index: Index of the frame.
+        :return cv2.typing.MatLike: The frame.
+        '''
+        if self._full_resolution_source is None:
+            self._full_resolution_source = VideoFrameSource(self.video_path, cache_size=4, start=self.first_frame)
+        return self._full_resolution_source[index]
+
+    def thumbnail(self, index: int, width: int = 160) -> cv2.typing.MatLike:
+        '''Return a low resolution version of a frame, for display purposes.
+
+        :param int index: Index of the frame.
+        :param int width: The width of the thumbnail, defaults to 160
+        :return cv2.typing.MatLike: The thumbnail.
+        '''
+        return cv2.resize(self[index], _scaled_size(self.width, self.height, width), interpolation=cv2.INTER_AREA)
+
+    def iter_frames(self, start: int = 0, stop: int = None, step: int = 1) -> Iterator[cv2.typing.MatLike]:
+        '''Iterate over the frames, decoding them without caching them.
+
+        :param int start: Index of the first frame, defaults to 0
+        :param int stop: Index after the last frame, defaults to None (end of the video)
+        :param int step: Only every step-th frame is decoded, defaults to 1
+        :return Iterator[cv2.typing.MatLike]: The frames.
+        '''
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        for i in range(start, stop, step):
+            yield self._decode(self.encoded_frames[i])
+
+    def release(self) -> None:
+        '''Release the memory holding the frames.'''
+        with self._lock:
+            self.encoded_frames = []
+            self._cache.clear()
+        if self._full_resolution_source is not None:
+            self._full_resolution_source.release()
+
+
+
+# Any object giving access to the frames of a video
+FrameSource = VideoFrameSource | FrameStore | CompressedFrameStore
+
+
+
+def _scaled_size(width: int, height: int, new_width: int = None) -> tuple[int, int]:
+    '''Return the size of an image resized to the given width, keeping its aspect ratio.'''
+    if new_width is None or new_width == width:
+        return width, height
+    return new_width, max(1, int(height * new_width / width)) # Rounded like imutils.resize
+
+
+def _clip_window(frame_count: int, start: int = 0, stop: int = None) -> tuple[int, int]:
+    '''Return the bounds of a window of frames, clipped to the frames of the video.'''
+    stop = frame_count if stop is None else min(stop, frame_count)
+    start = min(max(0, start), stop)
+    return start, stop
+
+
+def _seek(capture: cv2.VideoCapture, index: int) -> None:
+    '''Move a capture so that its next read returns the frame of the given index.
+    If the capture reports another position after seeking, the frames are skipped from the start of the video instead.
+    '''
+    if int(capture.get(cv2.CAP_PROP_POS_FRAMES)) == index:
+        return
+    capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+    if int(capture.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(index):
+            if not capture.grab(): # Grabbing a frame does not convert it, which is cheaper than reading it
+                break
+
+
+def _frame_digest(frame: cv2.typing.MatLike) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16).hexdigest()
+
+
+def _read_frame(capture: cv2.VideoCapture, dst: np.ndarray, resize: bool) -> bool:
+    '''Read the next frame of a capture into dst, resizing it to the size of dst if needed.'''
+    if not resize:
+        return capture.read(dst)[0]
+    ret, frame = capture.read()
+    if ret:
+        cv2.resize(frame, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=cv2.INTER_AREA)
+    return ret
+
+
+def decode_video(video_path: str, width: int = None, on_progress: Callable[[int, int], None] = None, start: int = 0, stop: int = None) -> FrameStore:
+    '''Decode a whole video, or a window of it, sequentially into a frame store.
+
+    :param str video_path: Path to the video file.
+    :param int width: The width the frames are resized to while decoding, defaults to None (full resolution)
+    :param Callable[[int, int], None] on_progress: Called with the number of decoded frames and the total number of frames, defaults to None
+    :param int start: Index of the first frame to decode, the capture seeks to it, defaults to 0
+    :param int stop: Index after the last frame to decode, defaults to None (end of the video)
+    :return FrameStore: The decoded frames.
+    '''
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f'Unable to open the video file: {video_path}')
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    total_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    full_size = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = _scaled_size(*full_size, width)
+    start, clipped_stop = _clip_window(total_count, start, stop)
+    frame_count = clipped_stop - start
+
+    frames = np.empty((frame_count, size[1], size[0], 3), dtype=np.uint8)
+    decoded_count = 0
+    try:
+        _seek(capture, start)
+        while True:
+            if stop is not None and decoded_count == frame_count:
+                break
+            if decoded_count == len(frames):
+                # The frame count given by the container can be underestimated
+                grown = np.empty((max(1, 2 * len(frames)), *frames.shape[1:]), dtype=np.uint8)
+                grown[:decoded_count] = frames
+                frames = grown
+            if not _read_frame(capture, frames[decoded_count], size != full_size):
+                break
+            decoded_count += 1
+            if on_progress is not None and decoded_count % 16 == 0:
+                on_progress(decoded_count, frame_count)
+    finally:
+        capture.release()
+
+    if on_progress is not None:
+        on_progress(decoded_count, decoded_count)
+    return FrameStore(video_path, frames[:decoded_count], fps, full_size, first_frame=start)
+
+
+# Values of the state flag following the progress of the segments in decode_video_segments
+_SEGMENTS_RUNNING = 0
+_SEGMENTS_STOPPED = 1
+_SEGMENTS_PAUSED = 2
+
+
+def _decode_segment(video_path: str, shm_name: str, shape: tuple[int], start: int, stop: int, progress_name: str, segment: int, first_frame: int = 0) -> tuple[int, str]:
+    '''Decode a range of frames of a video into a shared memory block.
+    This function is executed in the worker processes of decode_video_segments.
+
+    :param str video_path: Path to the video file.
+    :param str shm_name: The name of the shared memory block holding all the frames of the video.
+    :param tuple[int] shape: The shape of the frames array, in format (N, H, W, 3), frames are resized to fit it.
+    :param int start: Index of the first frame of the segment.
+    :param int stop: Index after the last frame of the segment.
+    :param str progress_name: The name of the shared memory block holding the number of decoded frames of each segment, followed by a state flag (see _SEGMENTS_*).
+    :param int segment: Index of the segment.
+    :param int first_frame: Index in the video of the first frame of the array, defaults to 0
+    :return tuple[int, str]: A tuple containing two elements,
+        - The number of decoded frames
+        - The digest of the frame preceding the segment, as decoded after seeking, or None for the first segment
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    progress_shm = shared_memory.SharedMemory(name=progress_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    progress = np.ndarray((progress_shm.size // 8,), dtype=np.int64, buffer=progress_shm.buf) # The last value is the state flag
+    capture = cv2.VideoCapture(video_path)
+    try:
+        full_size = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        resize = full_size != (shape[2], shape[1])
+
+        # The previous frame is decoded as well, to check that seeking is frame-exact
+        overlap_digest = None
+        if start > first_frame:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start - 1)
+            overlap_frame = np.empty(shape[1:], dtype=np.uint8)
+            if not _read_frame(capture, overlap_frame, resize):
+                return 0, None
+            overlap_digest = _frame_digest(overlap_frame)
+        else:
+            _seek(capture, start)
+
+        decoded = 0
+        for i in range(start - first_frame, stop - first_frame):
+            while progress[-1] == _SEGMENTS_PAUSED:
+                time.sleep(.05)
+            if progress[-1] == _SEGMENTS_STOPPED or not _read_frame(capture, frames[i], resize):
+                break
+            decoded += 1
+            progress[segment] = decoded
+        return decoded, overlap_digest
+    finally:
+        capture.release()
+        del frames, progress # The buffers can't be closed while an array still references them
+        shm.close()
+        progress_shm.close()
+
+
+def decode_video_segments(video_path: str, segments: int = None, width: int = None, on_progress: Callable[[int, int], None] = None, poll_interval: float = .05, start: int = 0, stop: int = None, running: threading.Event = None) -> FrameStore:
+    '''Decode a whole video, or a window of it, in parallel, by splitting it into time segments decoded by separate processes.
+
+    Each worker process opens its own capture, seeks to the start of its segment and decodes it
+    directly into a shared memory block. The frame preceding each segment is decoded too and compared
+    with the last frame of the previous segment: if seeking is not frame-exact for this video,
+    or if a segment ends early, the video is decoded again sequentially.
+    The worker processes can't wait on a threading.Event, so the state of the running event is mirrored
+    into a flag of shared memory, which they check before each frame.
+
+    :param str video_path: Path to the video file.
+    :param int segments: The number of segments, and worker processes, defaults to None (number of CPUs)
+    :param int width: The width the frames are resized to while decoding, defaults to None (full resolution)
+    :param Callable[[int, int], None] on_progress: Called with the number of decoded frames and the total number of frames, defaults to None
+    :param float poll_interval: The time between two calls to on_progress, in seconds, defaults to .05
+    :param int start: Index of the first frame to decode, defaults to 0
+    :param int stop: Index after the last frame to decode, defaults to None (end of the video)
+    :param threading.Event running: The decoding is paused while this event is cleared, defaults to None (never paused)
+    :return FrameStore: The decoded frames.
+    '''
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f'Unable to open the video file: {video_path}')
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    start, stop = _clip_window(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), start, stop)
+    frame_count = stop - start
+    full_size = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = _scaled_size(*full_size, width)
+    shape = (frame_count, size[1], size[0], 3)
+    capture.release()
+
+    # Bounds of the segments, as indexes of frames in the video
+    segments = max(1, min(segments or os.cpu_count() or 1, frame_count))
+    bounds = [start + frame_count * k // segments for k in range(segments + 1)]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))))
+    progress_shm = shared_memory.SharedMemory(create=True, size=8 * (segments + 1))
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    progress = np.ndarray((segments + 1,), dtype=np.int64, buffer=progress_shm.buf) # The last value is the state flag
+    progress[:] = 0
+
+    # on_progress may block while the decoding is paused, so the pause is mirrored into the flag by a thread of its own
+    # The thread is always joined before the flag is written by this function, or its shared memory is closed
+    mirrored = threading.Event()
+    def mirror_pause(flags: np.ndarray) -> None:
+        while not mirrored.wait(poll_interval):
+            flags[-1] = _SEGMENTS_RUNNING if running.is_set() else _SEGMENTS_PAUSED
+    def stop_mirror() -> None:
+        mirrored.set()
+        if mirror.ident is not None:
+            mirror.join()
+    mirror = threading.Thread(target=mirror_pause, args=(progress,), daemon=True)
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=segments) as executor:
+            futures = [
+                executor.submit(_decode_segment, video_path, shm.name, shape, bounds[k], bounds[k+1], progress_shm.name, k, start)
+                for k in range(segments)
+            ]
+            if running is not None:
+                mirror.start()
+            try:
+                while not all(f.done() for f in futures):
+                    concurrent.futures.wait(futures, timeout=poll_interval)
+                    if on_progress is not None:
+                        on_progress(int(progress[:-1].sum()), frame_count)
+            except BaseException:
+                # on_progress may interrupt the decoding, e.g. when the job running it is cancelled
+                stop_mirror()
+                progress[-1] = _SEGMENTS_STOPPED
+                raise
+            stop_mirror()
+            results = [f.result() for f in futures]
+
+        # Reassemble the segments, checking that they join exactly
+        exact = True
+        for k, (decoded, overlap_digest) in enumerate(results):
+            if k > 0 and overlap_digest != _frame_digest(frames[bounds[k] - 1 - start]):
+                exact = False
+            if k < segments - 1 and decoded != bounds[k+1] - bounds[k]:
+                exact = False
+        # The frame count given by the container can be overestimated, so the last segment may end early
+        decoded_count = bounds[-2] - start + results[-1][0]
+
+        if not exact:
+            decoded_count = 0
+            capture = cv2.VideoCapture(video_path)
+            _seek(capture, start)
+            while decoded_count < frame_count and _read_frame(capture, frames[decoded_count], size != full_size):
+                decoded_count += 1
+                if on_progress is not None and decoded_count % 16 == 0:
+                    on_progress(decoded_count, frame_count)
+            capture.release()
+
+        if on_progress is not None:
+            on_progress(decoded_count, decoded_count)
+    except BaseException:
+        del frames
+        shm.close()
+        shm.unlink()
+        raise
+    finally:
+        stop_mirror()
+        del progress
+        progress_shm.close()
+        progress_shm.unlink()
+
+    return FrameStore(video_path, frames[:decoded_count], fps, full_size, shm=shm, first_frame=start)
+
+
+def decode_video_compressed(video_path: str, width: int = None, codec: str = 'png', workers: int = None, on_progress: Callable[[int, int], None] = None, start: int = 0, stop: int = None) -> CompressedFrameStore:
+    '''Decode a whole video, or a window of it, sequentially into a compressed frame store.
+    Frames are encoded by a pool of threads while the next ones are being decoded.
+
+    :param str video_path: Path to the video file.
+    :param int width: The width the frames are resized to while decoding, defaults to None (full resolution)
+    :param str codec: The codec used to compress the frames, defaults to 'png'
+    :param int workers: The number of encoding threads, defaults to None (number of CPUs)
+    :param Callable[[int, int], None] on_progress: Called with the number of decoded frames and the total number of frames, defaults to None
+    :param int start: Index of the first frame to decode, the capture seeks to it, defaults to 0
+    :param int stop: Index after the last frame to decode, defaults to None (end of the video)
+    :return CompressedFrameStore: The decoded frames.
+    '''
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f'Unable to open the video file: {video_path}')
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    start, clipped_stop = _clip_window(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), start, stop)
+    frame_count = clipped_stop - start
+    full_size = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = _scaled_size(*full_size, width)
+    store = CompressedFrameStore(video_path, fps, full_size, (size[1], size[0], 3), codec, first_frame=start)
+
+    workers = workers or os.cpu_count() or 1
+    pending: collections.deque[concurrent.futures.Future] = collections.deque()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            _seek(capture, start)
+            frame = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            submitted = 0
+            while (stop is None or submitted < frame_count) and _read_frame(capture, frame, size != full_size):
+                pending.append(executor.submit(store.encode, frame))
+                submitted += 1
+                frame = np.empty_like(frame)
+                # Limit the number of frames waiting to be encoded, appending them in order
+                while len(pending) > 2 * workers or (pending and pending[0].done()):
+                    store.append(pending.popleft().result())
+                    if on_progress is not None and len(store) % 16 == 0:
+                        on_progress(len(store), frame_count)
+            while pending:
+                store.append(pending.popleft().result())
+    finally:
+        capture.release()
+
+    if on_progress is not None:
+        on_progress(len(store), len(store))
+    return store
@@ -0,0 +1,116 @@
+'''Benchmarks of the object detection on a local video.
+
+Run from the repository's root, for instance:
+    python -m benchmarks.detection path/to/video.mp4 --lower 0 100 100 --upper 10 255 255
+'''
+import cv2
+import time
+import imutils
+import argparse
+import tracemalloc
+import numpy as np
+from typing import Callable
+
+from app import video
+from app import detection
+
+
+
+def detect_object_baseline(frame: cv2.typing.MatLike, lower_bound: tuple[int], upper_bound: tuple[int], object_radius_threshold: int = 2, width: int = 600, output_scale: float = 1) -> tuple[tuple[int], tuple[int]]:
+    '''The detection as it was before the buffers were preallocated, every step allocating a new image.'''
+    frame = imutils.resize(frame, width=width)
+    hsv = cv2.cvtColor(cv2.GaussianBlur(frame, (11, 11), 0), cv2.COLOR_BGR2HSV)
+    mask = cv2.dilate(cv2.erode(cv2.inRange(hsv, lower_bound, upper_bound), None, iterations=2), None, iterations=2)
+    contours = imutils.grab_contours(cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
+    if len(contours) > 0:
+        c = max(contours, key=cv2.contourArea)
+        (x, y), radius = cv2.minEnclosingCircle(c)
+        m = cv2.moments(c)
+        if radius >= object_radius_threshold and m['m00'] != 0:
+            center = (int(output_scale * m['m10'] / m['m00']), int(output_scale * m['m01'] / m['m00']))
+            return (int(output_scale * x), int(output_scale * y), int(output_scale * radius)), center
+    return None, None
+
+
+def measure(frames: list[cv2.typing.MatLike], detect: Callable[[cv2.typing.MatLike], tuple]) -> tuple[list, float, float, float]:
+    '''Apply the detection function to every frame.
+    Stateful detection functions, such as the trackers, are reset before each pass over the frames,
+    so that every pass starts from the first frame without the state left by the previous one.
+
+    :param list[cv2.typing.MatLike] frames: The frames to process.
+    :param Callable detect: The detection function.
+    :return tuple[list, float, float, float]: The results, the time per frame in milliseconds,
+        and the number of allocations and of allocated kilobytes per frame (as seen by tracemalloc, which includes the images of OpenCV)
+    '''
+    reset = getattr(detect, 'reset', lambda: None)
+    detect(frames[0]) # Warm up, the buffers are allocated once
+
+    reset()
+    start = time.perf_counter()
+    results = [detect(frame) for frame in frames]
+    elapsed = time.perf_counter() - start
+
+    # Count the memory blocks allocated while processing each frame, from the peak above the memory in use before
+    allocations, allocated = 0, 0
+    reset()
+    tracemalloc.start()
+    for frame in frames:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        detect(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - current
+        stats = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+        allocations += sum(max(0, stat.count_diff) for stat in stats)
+    tracemalloc.stop()
+
+    n = len(frames)
+    return results, 1000 * elapsed / n, allocations / n, allocated / n / 1024
+
+
+def centroid_error(results: list[tuple], reference: list[tuple]) -> tuple[float, int]:
+    '''Compare the centroids found by a detection to the ones of the reference.
+
+    :param list[tuple] results: The (circle, centroid) found on each frame.
+    :param list[tuple] reference: The (circle, centroid) found on each frame by the reference.
+    :return tuple[float, int]: The mean distance between the centroids found by both, in pixels, and the number of frames where only one found the object.
+    '''
+    distances = [np.hypot(c[0] - r[0], c[1] - r[1]) for (_, c, *_), (_, r, *_) in zip(results, reference) if c is not None and r is not None]
+    mismatches = sum((c is None) != (r is None) for (_, c, *_), (_, r, *_) in zip(results, reference))
+    return float(np.mean(distances)) if distances else 0., mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', help='path to the video file')
+    parser.add_argument('--lower', type=int, nargs=3, default=(0, 100, 100), help='lower HSV bound of the object color')
+    parser.add_argument('--upper', type=int, nargs=3, default=(10, 255, 255), help='upper HSV bound of the object color')
+    parser.add_argument('--width', type=int, default=600, help='processing width')
+    parser.add_argument('--frames', type=int, default=200, help='maximum number of frames to process')
+    args = parser.parse_args()
+
+    source = video.VideoFrameSource(args.video)
+    frames = [frame for _, frame in zip(range(args.frames), source.iter_frames())]
+    source.release()
+    kwargs = dict(lower_bound=tuple(args.lower), upper_bound=tuple(args.upper), width=args.width)
+    print(f'{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, processed at a width of {args.width}px\n')
+
+    print(f'{"":<24}{"ms/frame":>10}{"allocs/frame":>14}{"KiB/frame":>12}{"error px":>10}')
+    reference = None
+    for name, detect in (
+        ('baseline', lambda frame: detect_object_baseline(frame, **kwargs)),
+        ('preallocated buffers', lambda frame: detection.detect_object(frame, **kwargs)),
+        ('connected components', lambda frame: detection.detect_object(frame, detector='components', **kwargs)),
+        ('pyramid', lambda frame: detection.detect_colored_objects_pyramid(frame, [(kwargs['lower_bound'], kwargs['upper_bound'])], width=args.width)[0]),
+        ('optical flow', detection.FlowTracker(kwargs['lower_bound'], kwargs['upper_bound'], width=args.width)),
+    ):
+        results, ms, allocations, kib = measure(frames, detect)
+        reference = reference or results
+        error, mismatches = centroid_error(results, reference)
+        note = '' if mismatches == 0 else f'  (found on {mismatches} frames more or less than the baseline)'
+        print(f'{name:<24}{ms:>10.2f}{allocations:>14.1f}{kib:>12.1f}{error:>10.2f}{note}')
+
+
+if __name__ == '__main__':
+    main()
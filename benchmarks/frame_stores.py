@@ -0,0 +1,56 @@
+'''Benchmarks of the frame stores on a local video: decoding time, memory and random access latency.
+
+Run from the repository's root, for instance:
+    python -m benchmarks.frame_stores path/to/video.mp4 --width 600
+'''
+import time
+import random
+import argparse
+
+from app import video
+
+
+
+def measure_access(store: video.FrameStore | video.CompressedFrameStore, accesses: int) -> float:
+    '''Read frames at random indexes, as the frame selectors of the interface do.
+
+    :param video.FrameStore | video.CompressedFrameStore store: The frames.
+    :param int accesses: The number of frames read.
+    :return float: The mean time taken to read a frame, in milliseconds.
+    '''
+    indexes = [random.randrange(len(store)) for _ in range(accesses)]
+    start = time.perf_counter()
+    for i in indexes:
+        store[i]
+    return 1000 * (time.perf_counter() - start) / accesses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', help='path to the video file')
+    parser.add_argument('--width', type=int, default=600, help='processing width')
+    parser.add_argument('--accesses', type=int, default=200, help='number of frames read at random indexes')
+    args = parser.parse_args()
+
+    print(f'{"":<16}{"load s":>10}{"MiB":>10}{"ratio":>8}{"access ms":>11}{"decode ms":>11}')
+
+    start = time.perf_counter()
+    store = video.decode_video(args.video, args.width)
+    elapsed = time.perf_counter() - start
+    raw_size = store.frames.nbytes
+    print(f'{"store":<16}{elapsed:>10.2f}{raw_size / 2**20:>10.1f}{1:>8.1f}{measure_access(store, args.accesses):>11.3f}{"":>11}')
+    store.release()
+
+    codecs = [codec for codec in video.CompressedFrameStore.codecs if codec != 'lz4' or video.lz4 is not None]
+    for codec in codecs:
+        start = time.perf_counter()
+        store = video.decode_video_compressed(args.video, args.width, codec)
+        elapsed = time.perf_counter() - start
+        access = measure_access(store, args.accesses)
+        # The latency of the store only counts the frames that were not in its cache
+        print(f'{"compressed " + codec:<16}{elapsed:>10.2f}{store.compressed_size / 2**20:>10.1f}{store.compression_ratio:>8.1f}{access:>11.3f}{1000 * store.access_latency:>11.3f}')
+        store.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 import os
 import configparser
+import multiprocessing
 
 from app import Application
 
 
 if __name__ == '__main__':  
+    # Required for the detection worker processes when running as a frozen executable
+    multiprocessing.freeze_support()
+
     config = configparser.ConfigParser()
     config.read(os.path.join(os.getcwd(), 'config.ini'))
 